@@ -1,19 +1,20 @@
-import pandas as pd
+from warehouse import WAREHOUSE_FILE, open_warehouse, query, refresh_warehouse
 
 phone = '201030454023'
 
+# Lookups go through the indexed warehouse (reloaded only if a source CSV changed)
+conn = open_warehouse(WAREHOUSE_FILE)
+refresh_warehouse(conn, ['retailer_profiles', 'overall_lines'])
+
 # Check retailers_profiles
-retailers = pd.read_csv('retailers_profiles.csv', sep='\t', encoding='utf-8')
-matches = retailers[retailers['phone'].astype(str) == phone]
+matches = query(conn, 'SELECT * FROM retailer_profiles WHERE phone = ?', (int(phone),))
 print(f'Rows with phone {phone} in retailers_profiles: {len(matches)}')
 if len(matches) > 0:
     print(matches[['retailer_name', 'phone', 'area', 'city']].head())
 
 # Check overall.csv
-overall = pd.read_csv('overall.csv', sep='\t', encoding='utf-8')
-matches2 = overall[overall['phone'].astype(str) == phone]
+matches2 = query(conn, 'SELECT name, phone FROM overall_lines WHERE phone = ?', (int(phone),))
 print(f'\nRows with phone {phone} in overall.csv: {len(matches2)}')
 if len(matches2) > 0:
     print(f'Unique names: {matches2["name"].unique()[:10]}')
     print(matches2[['name', 'phone']].head(10))
-
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dormancy and churn risk from each customer's own order cadence
+Purchase days are sorted once per customer; consecutive differences give the
+inter-order gaps, whose median is the customer's typical cadence. A customer
+is at risk when the days since their last order far exceed that cadence.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+CHURN_FILE = 'churn_risk.csv'
+
+# Gaps needed before a cadence is trusted (3 purchase days)
+MIN_GAPS = 2
+
+# (gap_ratio threshold, level), checked in order
+RISK_LEVELS = (
+    (4.0, 'high'),
+    (2.0, 'medium'),
+)
+
+TOP_PER_AREA = 20
+
+
+def build_churn(lines, customer_key='name', reference_date=None):
+    """DataFrame indexed by customer with cadence, days since the last order, gap ratio and risk level"""
+    dated = lines[lines['order_date'].notna()]
+    visits = dated[[customer_key, 'order_date']].drop_duplicates().sort_values([customer_key, 'order_date'])
+
+    keys = visits[customer_key].to_numpy()
+    days = visits['order_date'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    same_customer = keys[1:] == keys[:-1]
+    gaps = pd.Series(np.diff(days)[same_customer], index=keys[1:][same_customer])
+
+    churn = dated.groupby(customer_key).agg(
+        area=('area', 'last'),
+        last_order_date=('order_date', 'max'),
+        gmv=('gmv', 'sum')
+    )
+    churn['gaps'] = gaps.groupby(level=0).size().reindex(churn.index, fill_value=0)
+    churn['typical_gap_days'] = gaps.groupby(level=0).median().reindex(churn.index)
+
+    if reference_date is None:
+        reference_date = dated['order_date'].max()
+    churn['days_since_last_order'] = (pd.Timestamp(reference_date) - churn['last_order_date']).dt.days
+    churn['gap_ratio'] = (churn['days_since_last_order'] / churn['typical_gap_days']).where(churn['gaps'] >= MIN_GAPS)
+
+    ratio = churn['gap_ratio'].fillna(0).to_numpy()
+    churn['churn_risk'] = np.select([ratio >= threshold for threshold, _ in RISK_LEVELS],
+                                    [level for _, level in RISK_LEVELS], default='')
+    return churn
+
+
+def churn_records(churn):
+    """{customer: payload fields} ready to merge into the dashboard customer objects"""
+    payload = pd.DataFrame({
+        'typical_gap_days': churn['typical_gap_days'].round(1),
+        'gap_ratio': churn['gap_ratio'].round(2),
+        'churn_risk': churn['churn_risk'].replace('', None)
+    }, index=churn.index).astype(object)
+    payload = payload.where(payload.notna(), None)
+    return payload.to_dict('index')
+
+
+def at_risk_by_area(churn, limit=TOP_PER_AREA):
+    """{area: at-risk customers, high risk first, then by GMV}"""
+    severity = {level: rank for rank, (_, level) in enumerate(RISK_LEVELS)}
+    flagged = churn[churn['churn_risk'] != ''].copy()
+    flagged['severity'] = flagged['churn_risk'].map(severity)
+    flagged = flagged.sort_values(['area', 'severity', 'gmv'], ascending=[True, True, False])
+    flagged = flagged[flagged.groupby('area').cumcount() < limit]
+
+    ranked = {}
+    for name, row in zip(flagged.index, flagged.itertuples(index=False)):
+        ranked.setdefault(row.area, []).append({
+            'name': str(name),
+            'risk': row.churn_risk,
+            'days_since_last_order': int(row.days_since_last_order),
+            'typical_gap_days': round(float(row.typical_gap_days), 1),
+            'gap_ratio': round(float(row.gap_ratio), 2),
+            'gmv': round(float(row.gmv), 2)
+        })
+    return ranked
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    churn = build_churn(lines)
+    churn.to_csv(CHURN_FILE, encoding='utf-8')
+
+    print(f"Customers: {len(churn):,}, with a cadence: {(churn['gaps'] >= MIN_GAPS).sum():,}")
+    for _, level in RISK_LEVELS:
+        print(f"  {level} risk: {(churn['churn_risk'] == level).sum():,}")
+    print(f"✅ Churn risk saved to {CHURN_FILE}")
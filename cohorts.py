@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Monthly acquisition cohorts and their retention
+Each customer's cohort is the month of their first order; the matrix counts
+active customers and GMV per cohort and month offset in one grouped pass
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from time_series import period_codes, period_label
+
+COHORT_FILE = 'cohort_retention.csv'
+
+
+def build_cohorts(lines, customer_key='name'):
+    """Cohort × month-offset matrices of active customers, retention and GMV"""
+    dated = lines[lines['order_date'].notna()]
+    month = period_codes(dated['order_date'], 'monthly')
+    customer = pd.factorize(dated[customer_key].astype(str))[0]
+
+    frame = pd.DataFrame({'customer': customer, 'month': month, 'gmv': dated['gmv'].to_numpy()})
+    frame['cohort'] = frame.groupby('customer')['month'].transform('min')
+    frame['offset'] = frame['month'] - frame['cohort']
+
+    cells = frame.groupby(['cohort', 'offset']).agg(
+        customers=('customer', 'nunique'),
+        gmv=('gmv', 'sum')
+    )
+    active = cells['customers'].unstack(fill_value=0)
+    gmv = cells['gmv'].unstack(fill_value=0.0)
+
+    offsets = np.arange(active.columns.max() + 1 if len(active.columns) else 0)
+    active = active.reindex(columns=offsets, fill_value=0)
+    gmv = gmv.reindex(columns=offsets, fill_value=0.0)
+
+    sizes = active[0].to_numpy() if len(offsets) else np.zeros(0, dtype=np.int64)
+    retention = active.to_numpy() / np.maximum(sizes, 1)[:, None]
+
+    # Offsets past the end of the data are not observed yet
+    last_month = month.max() if len(month) else 0
+    observed = (active.index.to_numpy()[:, None] + offsets[None, :]) <= last_month
+
+    return {
+        'cohorts': period_label(active.index.to_numpy(), 'monthly'),
+        'offsets': offsets.tolist(),
+        'sizes': sizes.tolist(),
+        'active': active.to_numpy().tolist(),
+        'retention': np.where(observed, np.round(retention * 100, 1), None).tolist(),
+        'gmv': np.round(gmv.to_numpy(), 2).tolist()
+    }
+
+
+def cohorts_to_frame(cohorts):
+    """Long-format table: one row per cohort and month offset that has been observed"""
+    rows = []
+    for i, cohort in enumerate(cohorts['cohorts']):
+        for offset in cohorts['offsets']:
+            if cohorts['retention'][i][offset] is None:
+                continue
+            rows.append({
+                'cohort': cohort,
+                'month_offset': offset,
+                'cohort_size': cohorts['sizes'][i],
+                'active_customers': cohorts['active'][i][offset],
+                'retention_pct': cohorts['retention'][i][offset],
+                'gmv': cohorts['gmv'][i][offset]
+            })
+    return pd.DataFrame(rows, columns=['cohort', 'month_offset', 'cohort_size',
+                                       'active_customers', 'retention_pct', 'gmv'])
+
+
+def save_cohorts_csv(cohorts, path=COHORT_FILE):
+    """Write the cohort matrix as CSV"""
+    cohorts_to_frame(cohorts).to_csv(path, index=False, encoding='utf-8')
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    cohorts = build_cohorts(lines)
+    save_cohorts_csv(cohorts)
+
+    print(f"Cohorts: {len(cohorts['cohorts'])}, month offsets: {len(cohorts['offsets'])}")
+    for cohort, size, retention in zip(cohorts['cohorts'], cohorts['sizes'], cohorts['retention']):
+        month_1 = retention[1] if len(retention) > 1 and retention[1] is not None else '-'
+        print(f"  {cohort}: {size} customers, month 1 retention: {month_1}%")
+    print(f"✅ Cohort retention saved to {COHORT_FILE}")
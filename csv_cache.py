@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar cache for the tab-separated inputs
+load_csv() takes the same arguments as pd.read_csv. The first load parses
+the text and writes the DataFrame to CACHE_DIR as Parquet (dtypes and
+categoricals included) with a sidecar recording the source's size, mtime
+and content hash. Later loads read the Parquet file while size and mtime
+still match; when only the mtime moved, the hash decides. An optional
+prepare step (schema.py's canonical phones and ids) runs before the frame
+is cached, so cached loads come back already typed.
+
+Usage: python csv_cache.py [file ...]   warm the cache
+       python csv_cache.py --clear      delete it
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+
+import pandas as pd
+
+CACHE_DIR = '.csv_cache'
+
+# Bump when the cache layout changes so old entries are ignored
+CACHE_VERSION = 1
+
+HASH_CHUNK = 1 << 20
+
+
+def file_hash(path):
+    """blake2b digest of the file's content"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_paths(path, options, cache_dir=CACHE_DIR, prepare_key=None):
+    """(parquet file, sidecar) for a source file, its read_csv options and prepare step"""
+    key = repr((CACHE_VERSION, os.path.abspath(path), sorted(options.items(), key=lambda item: item[0]), prepare_key))
+    name = f"{os.path.basename(path)}.{hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()}"
+    return os.path.join(cache_dir, name + '.parquet'), os.path.join(cache_dir, name + '.json')
+
+
+def _read_sidecar(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_sidecar(path, sidecar):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f)
+
+
+def _write_cache(df, data_file, sidecar_file, sidecar):
+    """Write atomically; returns False when the frame cannot be stored as Parquet"""
+    os.makedirs(os.path.dirname(data_file), exist_ok=True)
+    partial = f"{data_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        df.to_parquet(partial)
+    except (ImportError, TypeError, ValueError) as e:
+        # Mixed-type object columns, non-string headers or no Parquet engine: stay uncached
+        print(f"⚠️ Not caching {sidecar['source']}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    os.replace(partial, data_file)
+    _write_sidecar(sidecar_file, sidecar)
+    return True
+
+
+def load_csv(path, use_cache=True, cache_dir=CACHE_DIR, prepare=None, prepare_key=None, **options):
+    """
+    pd.read_csv(path, **options), served from the columnar cache when the source is unchanged
+
+    prepare(df) runs on the parsed frame before it is cached; prepare_key
+    identifies it in the cache key and must change whenever its output would.
+    """
+    if not use_cache:
+        df = pd.read_csv(path, **options)
+        return prepare(df) if prepare else df
+
+    data_file, sidecar_file = cache_paths(path, options, cache_dir, prepare_key)
+    stat = os.stat(path)
+    sidecar = _read_sidecar(sidecar_file)
+
+    if sidecar and sidecar.get('size') == stat.st_size and os.path.exists(data_file):
+        if sidecar.get('mtime_ns') == stat.st_mtime_ns:
+            return pd.read_parquet(data_file)
+        if sidecar.get('hash') == file_hash(path):
+            sidecar['mtime_ns'] = stat.st_mtime_ns
+            _write_sidecar(sidecar_file, sidecar)
+            return pd.read_parquet(data_file)
+
+    df = pd.read_csv(path, **options)
+    if prepare:
+        df = prepare(df)
+    _write_cache(df, data_file, sidecar_file, {
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'hash': file_hash(path),
+        'rows': len(df)
+    })
+    return df
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    if os.path.isdir(cache_dir):
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    import time
+
+    if '--clear' in sys.argv:
+        clear_cache()
+        print(f"✅ Cleared {CACHE_DIR}")
+        sys.exit(0)
+
+    sources = sys.argv[1:] or ['data_cleaned.csv', 'data_cleaned_enriched.csv', 'retailers_profiles.csv', 'overall.csv']
+    for source in sources:
+        if not os.path.exists(source):
+            print(f"⚠️ {source} not found, skipping")
+            continue
+        started = time.perf_counter()
+        df = load_csv(source, sep='\t', low_memory=False, encoding='utf-8')
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        load_csv(source, sep='\t', low_memory=False, encoding='utf-8')
+        cached = time.perf_counter() - started
+        print(f"{source}: {len(df):,} rows, first load {first:.2f}s, cached load {cached:.3f}s")
+    print(f"✅ Cache ready in {CACHE_DIR}")
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent per-customer aggregate state for incremental dashboard refreshes
+An SQLite file keyed by customer ("name_phone") holds running GMV, line and
+item counts, first/last order dates, the customer's order ids and purchase
+dates (for distinct counts) and product/brand quantity tallies. merge_batch
+folds a batch of order lines into it with upserts, so refreshing the
+dashboard customers costs time proportional to the new rows.
+
+sync_history keeps the state equal to a full-history frame (the enriched
+data_cleaned.csv): it stamps every input file (size, mtime, content hash)
+and the number of lines merged, merges only the lines appended since the
+last run, and rebuilds the state when any input was otherwise changed.
+
+Usage: python customer_state.py new_rows.csv [more_rows.csv ...]
+Merges daily batches (tab-separated, data_cleaned layout) and rewrites the
+customers in dashboard_data.json from the state
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+from csv_cache import HASH_CHUNK
+from order_lines import fill_missing, parse_dates
+from schema import load_table
+
+STATE_FILE = 'customer_state.db'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS customers (
+    key TEXT PRIMARY KEY,
+    name TEXT,
+    phone INTEGER,
+    area TEXT,
+    city TEXT,
+    type TEXT,
+    total_gmv REAL NOT NULL DEFAULT 0,
+    line_count INTEGER NOT NULL DEFAULT 0,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    first_date TEXT,
+    last_date TEXT
+);
+CREATE TABLE IF NOT EXISTS customer_orders (
+    key TEXT NOT NULL,
+    order_id TEXT NOT NULL,
+    PRIMARY KEY (key, order_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS customer_dates (
+    key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    PRIMARY KEY (key, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS customer_products (
+    key TEXT NOT NULL,
+    product TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, product)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS customer_brands (
+    key TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (key, brand)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS batches (
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    PRIMARY KEY (source, size, mtime)
+);
+CREATE TABLE IF NOT EXISTS history (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    rows INTEGER,
+    key TEXT
+);
+'''
+
+STATE_TABLES = ('customers', 'customer_orders', 'customer_dates', 'customer_products', 'customer_brands',
+                'batches', 'history')
+
+UPSERT_CUSTOMERS = '''
+INSERT INTO customers (key, name, phone, area, city, type, total_gmv, line_count, item_count, first_date, last_date)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET
+    area = COALESCE(NULLIF(excluded.area, ''), area),
+    city = COALESCE(NULLIF(excluded.city, ''), city),
+    type = COALESCE(NULLIF(excluded.type, ''), type),
+    total_gmv = total_gmv + excluded.total_gmv,
+    line_count = line_count + excluded.line_count,
+    item_count = item_count + excluded.item_count,
+    first_date = MIN(COALESCE(first_date, excluded.first_date), COALESCE(excluded.first_date, first_date)),
+    last_date = MAX(COALESCE(last_date, excluded.last_date), COALESCE(excluded.last_date, last_date))
+'''
+
+
+def open_state(path=STATE_FILE, reset=False):
+    """Open (and create if needed) the state store; reset=True starts from empty"""
+    if reset and os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _clean_text(series):
+    """Stripped strings with '' for missing values"""
+    return fill_missing(series, '').astype(str).str.strip()
+
+
+def prepare_batch(df):
+    """Per-line columns the state needs, computed vectorized"""
+    name = df['name'].where(df['name'].notna(), 'Unknown').astype(str).str.strip()
+    phone = pd.to_numeric(df['phone'], errors='coerce').fillna(0).astype('int64')
+    amount = pd.to_numeric(df['amount'], errors='coerce').fillna(0.0)
+    price = pd.to_numeric(df['price_gross'], errors='coerce').fillna(0.0)
+    order_date = parse_dates(df['date'])
+
+    return pd.DataFrame({
+        'key': name + '_' + phone.astype(str),
+        'name': name,
+        'phone': phone,
+        'area': _clean_text(df['area']) if 'area' in df.columns else '',
+        'city': _clean_text(df['city']) if 'city' in df.columns else '',
+        'type': _clean_text(df['Type']) if 'Type' in df.columns else '',
+        'order_id': df['order_id'].astype(str),
+        'gmv': amount * price,
+        'items': amount.astype('int64'),
+        'date': fill_missing(df['date'], '').astype(str),
+        'order_date': order_date.dt.strftime('%Y-%m-%d'),
+        'product': _clean_text(df['product']) if 'product' in df.columns else '',
+        'brand': _clean_text(df['brand']) if 'brand' in df.columns else '',
+    })
+
+
+def merge_batch(conn, df):
+    """Fold a batch of order lines into the state (one transaction)"""
+    with conn:
+        return _merge_rows(conn, prepare_batch(df))
+
+
+def _merge_rows(conn, batch):
+    """Upsert prepared lines; the caller owns the transaction"""
+    if batch.empty:
+        return 0
+
+    totals = batch.groupby('key', sort=False).agg(
+        total_gmv=('gmv', 'sum'),
+        line_count=('gmv', 'size'),
+        item_count=('items', 'sum'),
+        first_date=('order_date', 'min'),
+        last_date=('order_date', 'max')
+    ).join(batch.drop_duplicates('key').set_index('key')[['name', 'phone']])
+    # Area, city and type are the customer's latest non-empty values, so lines
+    # merged later (and the upsert) and a rebuild from the full history agree
+    for column in ('area', 'city', 'type'):
+        known = batch[batch[column] != ''].drop_duplicates('key', keep='last').set_index('key')[column]
+        totals[column] = known.reindex(totals.index).fillna('')
+    totals = totals.astype(object).where(totals.notna(), None)
+
+    orders = batch[['key', 'order_id']].drop_duplicates()
+    dates = batch[['key', 'date']].drop_duplicates()
+    products = batch[batch['product'] != ''].groupby(['key', 'product'], sort=False)['items'].sum().reset_index()
+    brands = batch[batch['brand'] != ''].groupby(['key', 'brand'], sort=False)['items'].sum().reset_index()
+
+    conn.executemany(UPSERT_CUSTOMERS, (
+        (key, row.name, int(row.phone), row.area, row.city, row.type, float(row.total_gmv),
+         int(row.line_count), int(row.item_count), row.first_date, row.last_date)
+        for key, row in zip(totals.index, totals.itertuples(index=False))
+    ))
+    conn.executemany('INSERT OR IGNORE INTO customer_orders (key, order_id) VALUES (?, ?)',
+                     orders.itertuples(index=False, name=None))
+    conn.executemany('INSERT OR IGNORE INTO customer_dates (key, date) VALUES (?, ?)',
+                     dates.itertuples(index=False, name=None))
+    conn.executemany(
+        'INSERT INTO customer_products (key, product, quantity) VALUES (?, ?, ?) '
+        'ON CONFLICT(key, product) DO UPDATE SET quantity = quantity + excluded.quantity',
+        ((k, p, int(q)) for k, p, q in products.itertuples(index=False, name=None)))
+    conn.executemany(
+        'INSERT INTO customer_brands (key, brand, quantity) VALUES (?, ?, ?) '
+        'ON CONFLICT(key, brand) DO UPDATE SET quantity = quantity + excluded.quantity',
+        ((k, b, int(q)) for k, b, q in brands.itertuples(index=False, name=None)))
+
+    return len(batch)
+
+
+def merge_file(conn, path, sep='\t'):
+    """Merge a batch file once; returns rows merged (0 if this exact file was merged before)"""
+    stat = os.stat(path)
+    source = os.path.abspath(path)
+    seen = conn.execute('SELECT 1 FROM batches WHERE source = ? AND size = ? AND mtime = ?',
+                        (source, stat.st_size, stat.st_mtime_ns)).fetchone()
+    if seen:
+        return 0
+
+    batch = prepare_batch(load_table(path, sep=sep, low_memory=False, encoding='utf-8'))
+    # The merge and its batches row commit together, so a crash cannot leave a merged but unrecorded file
+    with conn:
+        rows = _merge_rows(conn, batch)
+        conn.execute('INSERT INTO batches (source, size, mtime, rows) VALUES (?, ?, ?, ?)',
+                     (source, stat.st_size, stat.st_mtime_ns, rows))
+    return rows
+
+
+def _hashes(path, prefix_size):
+    """(hash of the first prefix_size bytes, hash of the whole file), in one read"""
+    prefix, whole = hashlib.blake2b(digest_size=16), hashlib.blake2b(digest_size=16)
+    remaining = prefix_size
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            if remaining > 0:
+                prefix.update(chunk[:remaining])
+                remaining -= len(chunk)
+            whole.update(chunk)
+    return prefix.hexdigest(), whole.hexdigest()
+
+
+def _input_status(path, entry, appendable):
+    """('unchanged' | 'appended' | 'changed', content hash) of an input against its history entry"""
+    stat = os.stat(path)
+    if entry is not None and (stat.st_size, stat.st_mtime_ns) == entry[:2]:
+        return 'unchanged', entry[2]
+    prefix, whole = _hashes(path, entry[0] if entry is not None else 0)
+    if entry is None or stat.st_size < entry[0] or prefix != entry[2]:
+        return 'changed', whole
+    if stat.st_size == entry[0]:
+        return 'unchanged', whole
+    return ('appended' if appendable else 'changed'), whole
+
+
+def sync_history(conn, df, lines_source, inputs=(), key=None):
+    """
+    Keep the state equal to a full-history frame; returns (rows merged, changed inputs)
+
+    df holds lines_source's rows in file order (e.g. data_cleaned.csv after
+    enrichment); inputs are the other files it was derived from and key names
+    the derivation (the enrichment script). When lines_source only grew at
+    the end and nothing else changed, just the new rows are merged. Any other
+    change (a re-cleaned history, edited profiles, another key) rebuilds
+    the state from df, and the changed inputs are returned so callers can say so.
+    """
+    stored = {source: (size, mtime, hash_, rows, stored_key) for source, size, mtime, hash_, rows, stored_key
+              in conn.execute('SELECT source, size, mtime, hash, rows, key FROM history')}
+    paths = [path for path in [lines_source, *inputs] if os.path.exists(path)]
+
+    changed, stamps = [], {}
+    for path in paths:
+        source = os.path.abspath(path)
+        entry = stored.get(source)
+        status, hash_ = _input_status(path, entry, path == lines_source)
+        if status == 'changed' or entry[4] != key:
+            changed.append(path)
+        stamps[source] = hash_
+    changed += [os.path.basename(source) for source in stored if source not in stamps]
+
+    start = 0 if changed else stored[os.path.abspath(lines_source)][3]
+    if start > len(df):
+        changed.append(lines_source)
+        start = 0
+
+    with conn:
+        if changed:
+            for table in STATE_TABLES:
+                conn.execute(f'DELETE FROM {table}')
+        rows = _merge_rows(conn, prepare_batch(df.iloc[start:]))
+        conn.execute('DELETE FROM history')
+        for path in paths:
+            stat = os.stat(path)
+            conn.execute('INSERT INTO history (source, size, mtime, hash, rows, key) VALUES (?, ?, ?, ?, ?, ?)',
+                         (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stamps[os.path.abspath(path)],
+                          len(df) if path == lines_source else None, key))
+    return rows, changed
+
+
+def _tallies(conn, table, column):
+    """{key: {value: quantity}} for a tally table, largest first"""
+    tallies = {}
+    for key, value, quantity in conn.execute(
+            f'SELECT key, {column}, quantity FROM {table} ORDER BY key, quantity DESC'):
+        tallies.setdefault(key, {})[value] = quantity
+    return tallies
+
+
+def export_customers(conn):
+    """Customers in the dashboard_data.json layout, sorted by GMV"""
+    order_counts = dict(conn.execute('SELECT key, COUNT(*) FROM customer_orders GROUP BY key'))
+    date_counts = dict(conn.execute('SELECT key, COUNT(*) FROM customer_dates GROUP BY key'))
+    products = _tallies(conn, 'customer_products', 'product')
+    brands = _tallies(conn, 'customer_brands', 'brand')
+
+    customers_list = []
+    for (key, name, phone, area, city, type_, total_gmv, line_count, item_count,
+         first_date, last_date) in conn.execute('SELECT * FROM customers'):
+        unique_orders = order_counts.get(key, 0)
+        customers_list.append({
+            'name': name,
+            'phone': phone,
+            'area': area,
+            'city': city,
+            'type': type_,
+            'total_gmv': round(total_gmv, 2),
+            'order_count': line_count,
+            'unique_orders': unique_orders,
+            'item_count': item_count,
+            'avg_order_value': round(total_gmv / max(1, unique_orders), 2),
+            'unique_products': len(products.get(key, {})),
+            'unique_brands': len(brands.get(key, {})),
+            'unique_dates': date_counts.get(key, 0),
+            'first_order_date': first_date,
+            'last_order_date': last_date,
+            'products': products.get(key, {}),
+            'brands': brands.get(key, {}),
+            'orders': []
+        })
+
+    customers_list.sort(key=lambda x: x['total_gmv'], reverse=True)
+    return customers_list
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python customer_state.py new_rows.csv [more_rows.csv ...]")
+        sys.exit(1)
+
+    conn = open_state(STATE_FILE)
+    for path in sys.argv[1:]:
+        rows = merge_file(conn, path)
+        print(f"   [OK] Merged {rows:,} rows from {path}" if rows else f"   [SKIP] {path} already merged")
+
+    try:
+        with open('dashboard_data.json', 'r', encoding='utf-8') as f:
+            dashboard_data = json.load(f)
+    except FileNotFoundError:
+        dashboard_data = {}
+
+    dashboard_data['customers'] = export_customers(conn)
+    with open('dashboard_data.json', 'w', encoding='utf-8') as f:
+        json.dump(dashboard_data, f, ensure_ascii=False, indent=2)
+    print(f"   [OK] Updated dashboard_data.json with {len(dashboard_data['customers']):,} customers")
@@ -2,8 +2,10 @@ import pandas as pd
 import re
 from collections import defaultdict
 
+from schema import load_table
+
 # Read the CSV file
-df = pd.read_csv('data.csv', sep='\t', encoding='utf-8')
+df = load_table('data.csv', categories=False, sep='\t', encoding='utf-8')
 
 # City mapping - standardize city names
 CITY_MAPPING = {
@@ -8,9 +8,12 @@ import numpy as np
 import json
 import re
 import sys
+import time
 from difflib import SequenceMatcher
-from collections import defaultdict
 import warnings
+
+from customer_state import STATE_FILE, export_customers, open_state, sync_history
+from schema import load_rate, load_tables
 warnings.filterwarnings('ignore')
 
 # Ensure UTF-8 output on Windows
@@ -74,7 +77,7 @@ def find_best_retailer_match(phone, retailers_df):
         'retailer_type': best_match.get('retailer_type', ''),
         'area': best_match.get('area', ''),
         'city': best_match.get('city', ''),
-        'route': best_match.get('distribution_route', '')
+        'route': best_match.get('distribution_route', '') if pd.notna(best_match.get('distribution_route')) else ''
     }
 
 def find_best_product_match(base_id, products_df, overall_df=None):
@@ -193,36 +196,44 @@ def main():
     
     # Load data files
     print("\n[1/7] Loading data files...")
-    try:
-        data_cleaned = pd.read_csv('data_cleaned.csv', sep='\t', low_memory=False, encoding='utf-8')
-        print(f"   [OK] Loaded data_cleaned.csv: {len(data_cleaned):,} rows")
-    except Exception as e:
-        print(f"   [ERROR] Error loading data_cleaned.csv: {e}")
+    started = time.perf_counter()
+    loaded = load_tables({
+        'data_cleaned.csv': {'categories': False, 'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'},
+        'retailers_profiles.csv': {'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'},
+        'base-products-2025-11-27.csv': {'low_memory': False, 'encoding': 'utf-8'},
+        'overall.csv': {'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'}
+    })
+    print(f"   [OK] Loaded {len(loaded)} files in {time.perf_counter() - started:.2f}s")
+    
+    data_cleaned, seconds, size = loaded['data_cleaned.csv']
+    if isinstance(data_cleaned, Exception):
+        print(f"   [ERROR] Error loading data_cleaned.csv: {data_cleaned}")
         return
+    print(f"   [OK] Loaded data_cleaned.csv: {len(data_cleaned):,} rows ({load_rate(seconds, size)})")
     
-    try:
-        retailers_profiles = pd.read_csv('retailers_profiles.csv', sep='\t', low_memory=False, encoding='utf-8')
+    retailers_profiles, seconds, size = loaded['retailers_profiles.csv']
+    if isinstance(retailers_profiles, Exception):
+        print(f"   [ERROR] Error loading retailers_profiles.csv: {retailers_profiles}")
+        retailers_profiles = pd.DataFrame()
+    else:
         # Drop empty column if exists
         if 'Unnamed: 3' in retailers_profiles.columns:
             retailers_profiles = retailers_profiles.drop(columns=['Unnamed: 3'])
-        print(f"   [OK] Loaded retailers_profiles.csv: {len(retailers_profiles):,} rows")
-    except Exception as e:
-        print(f"   [ERROR] Error loading retailers_profiles.csv: {e}")
-        retailers_profiles = pd.DataFrame()
+        print(f"   [OK] Loaded retailers_profiles.csv: {len(retailers_profiles):,} rows ({load_rate(seconds, size)})")
     
-    try:
-        base_products = pd.read_csv('base-products-2025-11-27.csv', low_memory=False, encoding='utf-8')
-        print(f"   [OK] Loaded base-products-2025-11-27.csv: {len(base_products):,} rows")
-    except Exception as e:
-        print(f"   [ERROR] Error loading base-products-2025-11-27.csv: {e}")
+    base_products, seconds, size = loaded['base-products-2025-11-27.csv']
+    if isinstance(base_products, Exception):
+        print(f"   [ERROR] Error loading base-products-2025-11-27.csv: {base_products}")
         base_products = pd.DataFrame()
+    else:
+        print(f"   [OK] Loaded base-products-2025-11-27.csv: {len(base_products):,} rows ({load_rate(seconds, size)})")
     
-    try:
-        overall = pd.read_csv('overall.csv', sep='\t', low_memory=False, encoding='utf-8')
-        print(f"   [OK] Loaded overall.csv: {len(overall):,} rows")
-    except Exception as e:
-        print(f"   [ERROR] Error loading overall.csv: {e}")
+    overall, seconds, size = loaded['overall.csv']
+    if isinstance(overall, Exception):
+        print(f"   [ERROR] Error loading overall.csv: {overall}")
         overall = pd.DataFrame()
+    else:
+        print(f"   [OK] Loaded overall.csv: {len(overall):,} rows ({load_rate(seconds, size)})")
     
     # Analyze missing data
     print("\n[2/7] Analyzing missing data...")
@@ -281,6 +292,10 @@ def main():
                 pass
         print(f"   [OK] Cached {len(base_id_to_product):,} product mappings")
     
+    # Route column to fill from the retailer profiles
+    if 'distribution_route' not in data_enriched.columns:
+        data_enriched['distribution_route'] = ''
+    
     # Enrich data row by row
     print("\n[6/7] Enriching data (this may take a while)...")
     total_rows = len(data_enriched)
@@ -319,6 +334,13 @@ def main():
             if (pd.isna(city) or city == '') and retailer_info['city']:
                 data_enriched.at[idx, 'city'] = retailer_info['city']
                 improvements['city_filled'] += 1
+
+            # Fill distribution route
+            if retailer_info['route']:
+                current_route = row.get('distribution_route', '')
+                if pd.isna(current_route) or current_route == '':
+                    data_enriched.at[idx, 'distribution_route'] = retailer_info['route']
+                    improvements['route_filled'] += 1
         
         # Enrich product information from base-products
         if pd.notna(base_id):
@@ -392,77 +414,17 @@ def main():
         # Generate new statistics from enriched data
         print("\nGenerating statistics from enriched data...")
         
-        # Group by customer (name + phone)
-        customer_stats = defaultdict(lambda: {
-            'phone': None,
-            'area': '',
-            'city': '',
-            'type': '',
-            'total_gmv': 0.0,
-            'order_count': 0,
-            'unique_orders': set(),
-            'item_count': 0,
-            'products': defaultdict(int),
-            'brands': defaultdict(int),
-            'dates': set(),
-            'orders': []
-        })
-        
-        # Process enriched data
-        for _, row in data_enriched.iterrows():
-            name = str(row['name']).strip() if pd.notna(row['name']) else 'Unknown'
-            phone = int(row['phone']) if pd.notna(row['phone']) else 0
-            customer_key = f"{name}_{phone}"
-            
-            customer = customer_stats[customer_key]
-            if customer['phone'] is None:
-                customer['phone'] = phone
-                customer['area'] = str(row.get('area', '')).strip() if pd.notna(row.get('area')) else ''
-                customer['city'] = str(row.get('city', '')).strip() if pd.notna(row.get('city')) else ''
-                customer['type'] = str(row.get('Type', '')).strip() if pd.notna(row.get('Type')) else ''
-            
-            order_id = str(row['order_id'])
-            amount = float(row['amount']) if pd.notna(row['amount']) else 0.0
-            price = float(row['price_gross']) if pd.notna(row['price_gross']) else 0.0
-            date = str(row['date']) if pd.notna(row['date']) else ''
-            product = str(row.get('product', '')).strip() if pd.notna(row.get('product')) else ''
-            brand = str(row.get('brand', '')).strip() if pd.notna(row.get('brand')) else ''
-            
-            customer['total_gmv'] += amount * price
-            customer['order_count'] += 1
-            customer['unique_orders'].add(order_id)
-            customer['item_count'] += int(amount)
-            customer['dates'].add(date)
-            
-            if product:
-                customer['products'][product] += int(amount)
-            if brand:
-                customer['brands'][brand] += int(amount)
-        
-        # Convert to dashboard format
-        customers_list = []
-        for key, stats in customer_stats.items():
-            customers_list.append({
-                'name': key.split('_')[0],
-                'phone': stats['phone'],
-                'area': stats['area'],
-                'city': stats['city'],
-                'type': stats['type'],
-                'total_gmv': round(stats['total_gmv'], 2),
-                'order_count': stats['order_count'],
-                'unique_orders': len(stats['unique_orders']),
-                'item_count': stats['item_count'],
-                'avg_order_value': round(stats['total_gmv'] / max(1, len(stats['unique_orders'])), 2),
-                'unique_products': len(stats['products']),
-                'unique_brands': len(stats['brands']),
-                'unique_dates': len(stats['dates']),
-                'products': dict(stats['products']),
-                'brands': dict(stats['brands']),
-                'orders': []  # Simplified for now
-            })
-        
-        # Sort by total_gmv descending
-        customers_list.sort(key=lambda x: x['total_gmv'], reverse=True)
+        # Fold the lines appended to data_cleaned.csv since the last run into the
+        # per-customer state store; it is rebuilt when any input changed otherwise
+        state = open_state(STATE_FILE)
+        merged, changed = sync_history(state, data_enriched, 'data_cleaned.csv',
+                                       [name for name in loaded if name != 'data_cleaned.csv'], key='enrich_data_comprehensive')
+        if changed:
+            print(f"   [REBUILD] {', '.join(changed)} changed: rebuilt {STATE_FILE} from {merged:,} lines")
+        else:
+            print(f"   [OK] Merged {merged:,} new lines into {STATE_FILE}")
+        customers_list = export_customers(state)
+        state.close()
         
         # Update dashboard data
         dashboard_data['customers'] = customers_list
@@ -4,9 +4,11 @@ Fast Data Enrichment Script with Batch Processing
 
 import pandas as pd
 import json
-import re
 import sys
-from collections import defaultdict
+import time
+
+from customer_state import STATE_FILE, export_customers, open_state, sync_history
+from schema import load_rate, load_tables, phone_keys
 
 # Ensure UTF-8 output on Windows
 if sys.platform == 'win32':
@@ -16,14 +18,6 @@ if sys.platform == 'win32':
     except:
         pass
 
-def normalize_phone(phone):
-    """Normalize phone numbers for matching"""
-    if pd.isna(phone):
-        return None
-    phone = str(phone).strip()
-    phone = re.sub(r'\D', '', phone)
-    return phone
-
 print("=" * 80)
 print("FAST DATA ENRICHMENT SCRIPT")
 print("=" * 80)
@@ -33,35 +27,43 @@ sys.stdout.flush()
 print("\n[1/6] Loading data files...")
 sys.stdout.flush()
 
-try:
-    data_cleaned = pd.read_csv('data_cleaned.csv', sep='\t', low_memory=False, encoding='utf-8')
-    print(f"   [OK] Loaded data_cleaned.csv: {len(data_cleaned):,} rows")
-except Exception as e:
-    print(f"   [ERROR] Error loading data_cleaned.csv: {e}")
+started = time.perf_counter()
+loaded = load_tables({
+    'data_cleaned.csv': {'categories': False, 'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'},
+    'retailers_profiles.csv': {'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'},
+    'base-products-2025-11-27.csv': {'low_memory': False, 'encoding': 'utf-8'},
+    'overall.csv': {'sep': '\t', 'low_memory': False, 'encoding': 'utf-8'}
+})
+print(f"   [OK] Loaded {len(loaded)} files in {time.perf_counter() - started:.2f}s")
+
+data_cleaned, seconds, size = loaded['data_cleaned.csv']
+if isinstance(data_cleaned, Exception):
+    print(f"   [ERROR] Error loading data_cleaned.csv: {data_cleaned}")
     sys.exit(1)
+print(f"   [OK] Loaded data_cleaned.csv: {len(data_cleaned):,} rows ({load_rate(seconds, size)})")
 
-try:
-    retailers_profiles = pd.read_csv('retailers_profiles.csv', sep='\t', low_memory=False, encoding='utf-8')
+retailers_profiles, seconds, size = loaded['retailers_profiles.csv']
+if isinstance(retailers_profiles, Exception):
+    print(f"   [ERROR] Error loading retailers_profiles.csv: {retailers_profiles}")
+    retailers_profiles = pd.DataFrame()
+else:
     if 'Unnamed: 3' in retailers_profiles.columns:
         retailers_profiles = retailers_profiles.drop(columns=['Unnamed: 3'])
-    print(f"   [OK] Loaded retailers_profiles.csv: {len(retailers_profiles):,} rows")
-except Exception as e:
-    print(f"   [ERROR] Error loading retailers_profiles.csv: {e}")
-    retailers_profiles = pd.DataFrame()
+    print(f"   [OK] Loaded retailers_profiles.csv: {len(retailers_profiles):,} rows ({load_rate(seconds, size)})")
 
-try:
-    base_products = pd.read_csv('base-products-2025-11-27.csv', low_memory=False, encoding='utf-8')
-    print(f"   [OK] Loaded base-products-2025-11-27.csv: {len(base_products):,} rows")
-except Exception as e:
-    print(f"   [ERROR] Error loading base-products-2025-11-27.csv: {e}")
+base_products, seconds, size = loaded['base-products-2025-11-27.csv']
+if isinstance(base_products, Exception):
+    print(f"   [ERROR] Error loading base-products-2025-11-27.csv: {base_products}")
     base_products = pd.DataFrame()
+else:
+    print(f"   [OK] Loaded base-products-2025-11-27.csv: {len(base_products):,} rows ({load_rate(seconds, size)})")
 
-try:
-    overall = pd.read_csv('overall.csv', sep='\t', low_memory=False, encoding='utf-8')
-    print(f"   [OK] Loaded overall.csv: {len(overall):,} rows")
-except Exception as e:
-    print(f"   [ERROR] Error loading overall.csv: {e}")
+overall, seconds, size = loaded['overall.csv']
+if isinstance(overall, Exception):
+    print(f"   [ERROR] Error loading overall.csv: {overall}")
     overall = pd.DataFrame()
+else:
+    print(f"   [OK] Loaded overall.csv: {len(overall):,} rows ({load_rate(seconds, size)})")
 
 sys.stdout.flush()
 
@@ -72,7 +74,7 @@ sys.stdout.flush()
 phone_to_retailer = {}
 if not retailers_profiles.empty:
     # Normalize phones in retailers_profiles
-    retailers_profiles['phone_norm'] = retailers_profiles['phone'].apply(normalize_phone)
+    retailers_profiles['phone_norm'] = phone_keys(retailers_profiles['phone'])
     
     # Group by phone and get best record (most complete data)
     for phone_norm, group in retailers_profiles.groupby('phone_norm'):
@@ -173,8 +175,12 @@ improvements = {
     'category_filled': 0
 }
 
+# Route column to fill from the retailer profiles
+if 'distribution_route' not in data_enriched.columns:
+    data_enriched['distribution_route'] = ''
+
 # Normalize phones in data_cleaned for faster lookup
-data_enriched['phone_norm'] = data_enriched['phone'].apply(normalize_phone)
+data_enriched['phone_norm'] = phone_keys(data_enriched['phone'])
 
 total_rows = len(data_enriched)
 batch_size = 10000
@@ -218,6 +224,13 @@ for batch_start in range(0, total_rows, batch_size):
             if (pd.isna(city) or city == '') and retailer_info['city']:
                 data_enriched.at[idx, 'city'] = retailer_info['city']
                 improvements['city_filled'] += 1
+
+            # Fill distribution route
+            if retailer_info['route']:
+                current_route = row.get('distribution_route', '')
+                if pd.isna(current_route) or current_route == '':
+                    data_enriched.at[idx, 'distribution_route'] = retailer_info['route']
+                    improvements['route_filled'] += 1
         
         # Enrich product information
         if pd.notna(base_id):
@@ -285,76 +298,17 @@ try:
     print("\nGenerating statistics from enriched data...")
     sys.stdout.flush()
     
-    # Group by customer (name + phone)
-    customer_stats = defaultdict(lambda: {
-        'phone': None,
-        'area': '',
-        'city': '',
-        'type': '',
-        'total_gmv': 0.0,
-        'order_count': 0,
-        'unique_orders': set(),
-        'item_count': 0,
-        'products': defaultdict(int),
-        'brands': defaultdict(int),
-        'dates': set()
-    })
-    
-    # Process enriched data
-    for _, row in data_enriched.iterrows():
-        name = str(row['name']).strip() if pd.notna(row['name']) else 'Unknown'
-        phone = int(row['phone']) if pd.notna(row['phone']) else 0
-        customer_key = f"{name}_{phone}"
-        
-        customer = customer_stats[customer_key]
-        if customer['phone'] is None:
-            customer['phone'] = phone
-            customer['area'] = str(row.get('area', '')).strip() if pd.notna(row.get('area')) else ''
-            customer['city'] = str(row.get('city', '')).strip() if pd.notna(row.get('city')) else ''
-            customer['type'] = str(row.get('Type', '')).strip() if pd.notna(row.get('Type')) else ''
-        
-        order_id = str(row['order_id'])
-        amount = float(row['amount']) if pd.notna(row['amount']) else 0.0
-        price = float(row['price_gross']) if pd.notna(row['price_gross']) else 0.0
-        date = str(row['date']) if pd.notna(row['date']) else ''
-        product = str(row.get('product', '')).strip() if pd.notna(row.get('product')) else ''
-        brand = str(row.get('brand', '')).strip() if pd.notna(row.get('brand')) else ''
-        
-        customer['total_gmv'] += amount * price
-        customer['order_count'] += 1
-        customer['unique_orders'].add(order_id)
-        customer['item_count'] += int(amount)
-        customer['dates'].add(date)
-        
-        if product:
-            customer['products'][product] += int(amount)
-        if brand:
-            customer['brands'][brand] += int(amount)
-    
-    # Convert to dashboard format
-    customers_list = []
-    for key, stats in customer_stats.items():
-        customers_list.append({
-            'name': key.split('_')[0],
-            'phone': stats['phone'],
-            'area': stats['area'],
-            'city': stats['city'],
-            'type': stats['type'],
-            'total_gmv': round(stats['total_gmv'], 2),
-            'order_count': stats['order_count'],
-            'unique_orders': len(stats['unique_orders']),
-            'item_count': stats['item_count'],
-            'avg_order_value': round(stats['total_gmv'] / max(1, len(stats['unique_orders'])), 2),
-            'unique_products': len(stats['products']),
-            'unique_brands': len(stats['brands']),
-            'unique_dates': len(stats['dates']),
-            'products': dict(stats['products']),
-            'brands': dict(stats['brands']),
-            'orders': []
-        })
-    
-    # Sort by total_gmv descending
-    customers_list.sort(key=lambda x: x['total_gmv'], reverse=True)
+    # Fold the lines appended to data_cleaned.csv since the last run into the
+    # per-customer state store; it is rebuilt when any input changed otherwise
+    state = open_state(STATE_FILE)
+    merged, changed = sync_history(state, data_enriched, 'data_cleaned.csv',
+                                   [name for name in loaded if name != 'data_cleaned.csv'], key='enrich_data_fast')
+    if changed:
+        print(f"   [REBUILD] {', '.join(changed)} changed: rebuilt {STATE_FILE} from {merged:,} lines")
+    else:
+        print(f"   [OK] Merged {merged:,} new lines into {STATE_FILE}")
+    customers_list = export_customers(state)
+    state.close()
     
     # Update dashboard data
     dashboard_data['customers'] = customers_list
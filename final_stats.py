@@ -1,6 +1,8 @@
-import pandas as pd
+from schema import load_table
 
-df = pd.read_csv('data_cleaned_enriched.csv', sep='\t', encoding='utf-8')
+# Only the columns reported below; phone, product and brand counts are not in the rollup cube
+df = load_table('data_cleaned_enriched.csv', sep='\t', encoding='utf-8',
+                usecols=['name', 'phone', 'product', 'brand', 'amount', 'price_gross'])
 
 print('Final Statistics:')
 print(f'Total rows: {len(df):,}')
@@ -1,11 +1,17 @@
 """
 Fix customer segmentation in dashboard_data.json
 Adds segmentation logic that was missing from the enrichment script
+
+Usage: python fix_segmentation.py [rules.json]
+Re-segments with another rule set without rebuilding the dashboard
+(defaults to segmentation_rules.json)
 """
 
 import json
 import sys
 
+from segmentation import RULES_FILE, build_metric_sketches, classify_customers, compile_rules, customer_metrics, load_rules
+
 # Ensure UTF-8 output on Windows
 if sys.platform == 'win32':
     try:
@@ -14,107 +20,19 @@ if sys.platform == 'win32':
     except:
         pass
 
-def classify_customer(customer):
-    """
-    Classify customers into segments based on their behavior and value
-    This matches the logic from generate_comprehensive_dashboard.py
-    """
-    gmv = customer['total_gmv']
-    orders = customer['unique_orders']
-    avg_value = customer.get('avg_order_value', 0)
-    if avg_value == 0 and orders > 0:
-        avg_value = gmv / orders
-    unique_dates = customer.get('unique_dates', 0)
-    
-    # Calculate metrics
-    frequency_score = min(unique_dates / 30, 1) * 100 if unique_dates > 0 else 0  # Activity frequency
-    value_score = min(gmv / 100000, 1) * 100  # Monetary value
-    order_consistency = min(orders / 100, 1) * 100  # Order consistency
-    
-    # Premium Customer: Top tier by GMV
-    if gmv > 1000000:
-        return {
-            'segment': 'premium',
-            'segment_color': '#10b981',
-            'segment_reason': 'عميل متميز - قيمة عالية وطلبات متكررة'
-        }
-    
-    # High Value Customer: High GMV
-    if gmv > 500000:
-        return {
-            'segment': 'high_value',
-            'segment_color': '#3b82f6',
-            'segment_reason': 'عميل عالي القيمة - إنفاق عالي'
-        }
-    
-    # Loyal Customer: Many orders with consistent purchases
-    if orders > 200 and frequency_score > 70:
-        return {
-            'segment': 'loyal',
-            'segment_color': '#06b6d4',
-            'segment_reason': 'عميل مخلص - منتظم الشراء'
-        }
-    
-    # Growing Customer: Increasing trend (reasonable orders and value)
-    if orders > 50 and gmv > 100000 and avg_value > 1000:
-        return {
-            'segment': 'growing',
-            'segment_color': '#8b5cf6',
-            'segment_reason': 'عميل نام - نشاط متزايد'
-        }
-    
-    # Potential Customer: Low frequency but good order value
-    if avg_value > 500 and orders > 10:
-        return {
-            'segment': 'potential',
-            'segment_color': '#eab308',
-            'segment_reason': 'عميل محتمل - له إمكانيات'
-        }
-    
-    # Active Customer: Regular orders
-    if orders > 50:
-        return {
-            'segment': 'active',
-            'segment_color': '#8b5cf6',
-            'segment_reason': 'عميل نشط - طلبات منتظمة'
-        }
-    
-    # Occasional Customer: Few orders but reasonable value
-    if orders > 10 and gmv > 10000:
-        return {
-            'segment': 'occasional',
-            'segment_color': '#a78bfa',
-            'segment_reason': 'عميل عارض - طلبات متقطعة'
-        }
-    
-    # Inactive Customer: Very few orders or no recent activity
-    if orders <= 5 or unique_dates == 0:
-        return {
-            'segment': 'inactive',
-            'segment_color': '#6b7280',
-            'segment_reason': 'عميل غير نشط'
-        }
-    
-    # Lost Customer: Had orders but very low activity
-    if orders <= 10 and gmv < 10000:
-        return {
-            'segment': 'lost',
-            'segment_color': '#ef4444',
-            'segment_reason': 'عميل مفقود - طلبات قليلة جداً'
-        }
-    
-    # Default
-    return {
-        'segment': 'regular',
-        'segment_color': '#9ca3af',
-        'segment_reason': 'عميل عادي'
-    }
-
 print("=" * 80)
 print("FIXING CUSTOMER SEGMENTATION")
 print("=" * 80)
 sys.stdout.flush()
 
+rules_file = sys.argv[1] if len(sys.argv) > 1 else RULES_FILE
+try:
+    rules = load_rules(rules_file)
+    print(f"\nUsing segmentation rules: {rules_file} ({len(rules['segments'])} segments)")
+except Exception as e:
+    print(f"   [ERROR] Error loading segmentation rules {rules_file}: {e}")
+    sys.exit(1)
+
 # Load dashboard data
 print("\n[1/3] Loading dashboard_data.json...")
 try:
@@ -133,21 +51,25 @@ customers = dashboard_data.get('customers', [])
 segments_count = {}
 segments_gmv = {}
 
-for i, customer in enumerate(customers):
-    if (i + 1) % 100 == 0:
-        print(f"   Processing customer {i + 1:,} / {len(customers):,}")
-        sys.stdout.flush()
-    
-    # Calculate segmentation
-    segmentation = classify_customer(customer)
-    
+# Quantile mode: cutoffs sketched from the customers being segmented. A saved
+# segment_quantiles.json may predate this payload (or describe another
+# population), and sketching the current customers is cheap
+if rules['mode'] == 'quantile':
+    sketches = build_metric_sketches(customer_metrics(customers))
+    print(f"   Sketched quantile cutoffs from {len(customers):,} customers")
+    rules = compile_rules(rules['config'], sketches)
+    for seg in rules['config']['segments']:
+        cutoffs = ', '.join(f"{c['metric']} {c['op']} {c['value']:,}" for c in seg['when'] if 'metric' in c)
+        print(f"      - {seg['key']}: {cutoffs}")
+
+for customer, segmentation in zip(customers, classify_customers(customers, rules)):
     # Update customer with segmentation
-    customer['segment'] = segmentation['segment']
-    customer['segment_color'] = segmentation['segment_color']
-    customer['segment_reason'] = segmentation['segment_reason']
+    customer['segment'] = segmentation['key']
+    customer['segment_color'] = segmentation['color']
+    customer['segment_reason'] = segmentation['reason']
     
     # Count segments
-    seg = segmentation['segment']
+    seg = segmentation['key']
     segments_count[seg] = segments_count.get(seg, 0) + 1
     segments_gmv[seg] = segments_gmv.get(seg, 0) + customer['total_gmv']
 
@@ -156,31 +78,8 @@ sys.stdout.flush()
 
 # Update segments distribution
 print("\n[3/3] Updating segments distribution...")
-segment_colors = {
-    'premium': '#10b981',
-    'high_value': '#3b82f6',
-    'loyal': '#06b6d4',
-    'growing': '#8b5cf6',
-    'potential': '#eab308',
-    'active': '#8b5cf6',
-    'occasional': '#a78bfa',
-    'inactive': '#6b7280',
-    'lost': '#ef4444',
-    'regular': '#9ca3af'
-}
-
-segment_names = {
-    'premium': 'متميز',
-    'high_value': 'عالي القيمة',
-    'loyal': 'وفي',
-    'growing': 'نام',
-    'potential': 'محتمل',
-    'active': 'نشط',
-    'occasional': 'عارض',
-    'inactive': 'غير نشط',
-    'lost': 'مفقود',
-    'regular': 'عادي'
-}
+segment_colors = {seg['key']: seg['color'] for seg in rules['segments'] + [rules['default']]}
+segment_names = {seg['key']: seg['name'] for seg in rules['segments'] + [rules['default']]}
 
 segments_distribution = []
 for seg in sorted(segments_count.keys()):
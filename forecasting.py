@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Next-month GMV forecasts per area and city
+Monthly series from time_series.py become one dense (series × month) matrix;
+additive Holt-Winters (damped trend, yearly seasonality once there are two
+years of history) runs over every series and every smoothing-parameter
+combination at once, one vectorized step per month. Each series keeps the
+combination with the lowest one-step-ahead error, whose spread gives the
+prediction intervals.
+"""
+import itertools
+import sys
+
+import numpy as np
+import pandas as pd
+
+FORECAST_FILE = 'gmv_forecast.csv'
+
+FORECAST_LEVELS = ('area', 'city')
+HORIZON = 3
+SEASON_LENGTH = 12
+DAMPING = 0.9
+
+# Smoothing-parameter grid searched for every series (level, trend, seasonal)
+ALPHAS = (0.2, 0.4, 0.6, 0.8)
+BETAS = (0.0, 0.1, 0.3)
+GAMMAS = (0.0, 0.1, 0.3)
+
+# Interval coverage -> two-sided normal quantile
+INTERVALS = {80: 1.2816, 95: 1.96}
+
+
+def dense_monthly(series):
+    """(keys, month codes, series × month GMV matrix) over a gap-free month axis"""
+    months = np.array(series['periods'], dtype='datetime64[M]').astype(np.int64)
+    if len(months) == 0:
+        return [], np.array([], dtype=np.int64), np.zeros((len(series['keys']), 0))
+    axis = np.arange(months.min(), months.max() + 1)
+
+    counts = np.diff(series['offsets'])
+    rows = np.repeat(np.arange(len(series['keys'])), counts)
+    columns = months[np.asarray(series['period_index'], dtype=np.int64)] - axis[0]
+    values = np.zeros((len(series['keys']), len(axis)))
+    values[rows, columns] = series['gmv']
+    return list(series['keys']), axis, values
+
+
+def drop_partial_month(axis, values, last_date):
+    """Leave out the last month when last_date is not its final day"""
+    if last_date is None or len(axis) == 0:
+        return axis, values
+    day = np.datetime64(pd.Timestamp(last_date).date(), 'D')
+    if (day + 1).astype('datetime64[M]') == day.astype('datetime64[M]') and day.astype('datetime64[M]').astype(np.int64) == axis[-1]:
+        return axis[:-1], values[:, :-1]
+    return axis, values
+
+
+def _initial_state(values, starts, seasonal):
+    """Level, trend and seasonal components at each series' first active month"""
+    n = len(values)
+    rows = np.arange(n)
+    level = values[rows, starts]
+    trend = np.zeros(n)
+    season = np.zeros((n, SEASON_LENGTH))
+    if seasonal.any():
+        # Trend from the first two years' means, seasonal indices from the detrended first year
+        offsets = np.arange(SEASON_LENGTH)
+        window = np.minimum(starts[:, None] + offsets, values.shape[1] - 1)
+        first_year = values[rows[:, None], window]
+        second_year = values[rows[:, None], np.minimum(window + SEASON_LENGTH, values.shape[1] - 1)]
+        first_mean = first_year.mean(axis=1)
+        slope = (second_year.mean(axis=1) - first_mean) / SEASON_LENGTH
+        start_level = first_mean - slope * (SEASON_LENGTH - 1) / 2
+
+        fitted = start_level[:, None] + slope[:, None] * offsets
+        season[rows[:, None], window % SEASON_LENGTH] = np.where(seasonal[:, None], first_year - fitted, 0.0)
+        level = np.where(seasonal, start_level, level)
+        trend = np.where(seasonal, slope, trend)
+    return level, trend, season
+
+
+def holt_winters(values, starts, seasonal, alpha, beta, gamma, horizon=HORIZON, phi=DAMPING):
+    """
+    Run additive damped Holt-Winters over every row of values at once
+
+    alpha, beta and gamma are per-row arrays. Returns (forecasts over the
+    horizon, sum of squared one-step errors, number of errors).
+    """
+    n, periods = values.shape
+    rows = np.arange(n)
+    level, trend, season = _initial_state(values, starts, seasonal)
+    gamma = np.where(seasonal, gamma, 0.0)
+    sse = np.zeros(n)
+
+    for t in range(periods):
+        active = t > starts
+        slot = t % SEASON_LENGTH
+        y = values[:, t]
+        s = season[:, slot]
+        error = y - (level + phi * trend + s)
+
+        new_level = alpha * (y - s) + (1 - alpha) * (level + phi * trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        new_season = gamma * (y - new_level) + (1 - gamma) * s
+
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+        season[:, slot] = np.where(active, new_season, s)
+        sse += np.where(active, error ** 2, 0.0)
+
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(phi ** steps)
+    slots = (periods + steps - 1) % SEASON_LENGTH
+    forecasts = level[:, None] + damped[None, :] * trend[:, None] + season[rows[:, None], slots[None, :]]
+    errors = np.maximum(periods - 1 - starts, 0)
+    return forecasts, sse, errors
+
+
+def fit_forecasts(values, horizon=HORIZON):
+    """Best grid combination per series -> (forecasts, residual sigma, alpha, beta) per row"""
+    n, periods = values.shape
+    active = values > 0
+    starts = np.where(active.any(axis=1), active.argmax(axis=1), periods - 1)
+    seasonal = periods - starts >= 2 * SEASON_LENGTH
+
+    grid = np.array(list(itertools.product(ALPHAS, BETAS, GAMMAS if seasonal.any() else (0.0,))))
+    combos = len(grid)
+    forecasts, sse, errors = holt_winters(
+        np.tile(values, (combos, 1)), np.tile(starts, combos), np.tile(seasonal, combos),
+        np.repeat(grid[:, 0], n), np.repeat(grid[:, 1], n), np.repeat(grid[:, 2], n), horizon
+    )
+
+    best = sse.reshape(combos, n).argmin(axis=0)
+    picked = best * n + np.arange(n)
+    sigma = np.sqrt(sse[picked] / np.maximum(errors[picked], 1))
+    return forecasts[picked], sigma, grid[best, 0], grid[best, 1]
+
+
+def forecast_intervals(forecasts, sigma, alpha, beta):
+    """{coverage: (lower, upper)}, widening with the horizon as for additive-trend smoothing"""
+    steps = np.arange(forecasts.shape[1])
+    # Variance multiplier 1 + sum_{j<h} (alpha * (1 + j * beta))^2
+    weights = (alpha[:, None] * (1 + steps[None, :] * beta[:, None])) ** 2
+    spread = sigma[:, None] * np.sqrt(1 + np.cumsum(weights, axis=1) - weights)
+    return {coverage: (np.maximum(forecasts - z * spread, 0.0), forecasts + z * spread)
+            for coverage, z in INTERVALS.items()}
+
+
+def build_forecasts(time_series, last_date=None, levels=FORECAST_LEVELS, horizon=HORIZON):
+    """{level: column-wise forecasts} for the monthly series of every level present"""
+    result = {}
+    monthly = time_series.get('monthly', {})
+    for level in levels:
+        if level not in monthly:
+            continue
+        keys, axis, values = dense_monthly(monthly[level])
+        axis, values = drop_partial_month(axis, values, last_date)
+        if len(axis) == 0 or not keys:
+            continue
+
+        forecasts, sigma, alpha, beta = fit_forecasts(values, horizon)
+        intervals = forecast_intervals(forecasts, sigma, alpha, beta)
+        forecasts = np.maximum(forecasts, 0.0)
+
+        months = np.arange(axis[-1] + 1, axis[-1] + 1 + horizon).astype('datetime64[M]')
+        entry = {
+            'keys': keys,
+            'last_month': str(axis[-1].astype('datetime64[M]')),
+            'last_gmv': np.round(values[:, -1], 2).tolist(),
+            'periods': np.datetime_as_string(months, unit='M').tolist(),
+            'forecast': np.round(forecasts, 2).tolist()
+        }
+        for coverage, (lower, upper) in intervals.items():
+            entry[f'lower_{coverage}'] = np.round(lower, 2).tolist()
+            entry[f'upper_{coverage}'] = np.round(upper, 2).tolist()
+        result[level] = entry
+    return result
+
+
+def forecast_frame(forecasts):
+    """Long-format table of every level, key and forecast month"""
+    rows = []
+    for level, entry in forecasts.items():
+        for i, key in enumerate(entry['keys']):
+            for h, period in enumerate(entry['periods']):
+                row = {'level': level, 'key': key, 'period': period, 'forecast': entry['forecast'][i][h]}
+                for coverage in INTERVALS:
+                    row[f'lower_{coverage}'] = entry[f'lower_{coverage}'][i][h]
+                    row[f'upper_{coverage}'] = entry[f'upper_{coverage}'][i][h]
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    import time
+
+    from order_lines import prepare_order_lines
+    from schema import load_table
+    from time_series import build_all_series
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    series = build_all_series(lines, frequencies=('monthly',))
+
+    started = time.perf_counter()
+    forecasts = build_forecasts(series, lines['order_date'].max())
+    elapsed = time.perf_counter() - started
+    forecast_frame(forecasts).to_csv(FORECAST_FILE, index=False, encoding='utf-8')
+
+    for level, entry in forecasts.items():
+        total = sum(row[0] for row in entry['forecast'])
+        print(f"{level}: {len(entry['keys']):,} series, {entry['periods'][0]} forecast {total:,.2f} EGP")
+    print(f"Fitted in {elapsed:.2f}s")
+    print(f"✅ Forecasts saved to {FORECAST_FILE}")
@@ -6,6 +6,46 @@ from collections import defaultdict
 from datetime import datetime
 import statistics
 import re
+from schema import load_table
+from topk import grouped_top_k, rank_groups
+from order_lines import prepare_order_lines
+from orders import ORDERS_FILE, build_orders, order_metrics, save_orders
+from partitions import PARTITION_DIR, is_current, load_stats, write_partitions
+from price_anomalies import ANOMALY_FILE, anomaly_report, apply_price_policy, detect_price_anomalies
+from rollup_cube import CUBE_FILE, build_cube, save_cube
+from time_series import build_all_series
+from forecasting import FORECAST_FILE, build_forecasts, forecast_frame
+from cohorts import COHORT_FILE, build_cohorts, save_cohorts_csv
+from rfm import build_rfm, rfm_records
+from churn import CHURN_FILE, at_risk_by_area, build_churn, churn_records
+from pareto import ABC_FILE, build_abc, save_abc_csv
+from routes import ROUTE_DAY_FILE, ROUTE_FILE, attach_routes, build_route_performance, route_records
+from market_basket import BASKET_FILE, build_market_basket, save_market_basket
+from leaderboards import LEADERBOARD_FILE, build_leaderboards, save_leaderboards
+from order_values import (ORDER_VALUE_FILE, build_order_value_sketches, save_order_value_sketches, segment_lines,
+                          sketches_to_dict)
+from recommendations import RECOMMENDATIONS_FILE, build_recommendations, save_recommendations
+from segmentation import (DEFAULT_SEGMENT, QUANTILES_FILE, SEGMENTS, build_metric_sketches,
+                          classify_customers, customer_metrics, save_metric_sketches)
+from warehouse import WAREHOUSE_FILE, open_warehouse, refresh_warehouse
+
+# Customers kept per group at each hierarchy level
+TOP_K_PER_LEVEL = {
+    'area': 10,
+    'city': 50,
+}
+
+# Per-group K overrides, e.g. {'city': {'محافظة القاهرة': 200}}
+TOP_K_OVERRIDES = {
+    'area': {},
+    'city': {},
+}
+
+# Outlier prices per base_id: 'flag' (report only), 'exclude' (drop the lines) or 'cap' (clip to the robust range)
+PRICE_POLICY = 'flag'
+
+# Refresh the local SQLite warehouse (indexed order lines and profiles for ad-hoc lookups)
+BUILD_WAREHOUSE = True
 
 # Area/City Normalization Mapping
 AREA_CITY_MAPPING = {
@@ -65,60 +105,57 @@ def normalize_area_city(area, city):
     
     return area, city
 
-# Customer Segmentation Function
-def classify_customer(customer):
-    """
-    Classify customers into segments based on their behavior and value
-    """
-    gmv = customer['total_gmv']
-    orders = customer['unique_orders']
-    avg_value = customer['avg_order_value']
-    unique_dates = customer['unique_dates']
-    
-    # Calculate metrics
-    frequency_score = min(unique_dates / 30, 1) * 100 if unique_dates > 0 else 0  # Activity frequency
-    value_score = min(gmv / 100000, 1) * 100  # Monetary value
-    order_consistency = min(orders / 100, 1) * 100  # Order consistency
-    
-    # High Value Customer: Top 10% by GMV
-    if gmv > 1000000:
-        return {'segment': 'عميل مميز', 'color': '#4ade80', 'reason': 'قيمة GMV عالية جداً'}
-    
-    # Premium Customer: Top 25% by GMV
-    if gmv > 500000:
-        return {'segment': 'عميل فئة أولى', 'color': '#60a5fa', 'reason': 'قيمة GMV عالية'}
-    
-    # Loyal Customer: Many orders with consistent purchases
-    if orders > 200 and frequency_score > 70:
-        return {'segment': 'عميل وفي', 'color': '#34d399', 'reason': 'عدد طلبات عالي مع انتظام'}
-    
-    # Growing Customer: Increasing trend (reasonable orders and value)
-    if orders > 50 and gmv > 100000 and avg_value > 1000:
-        return {'segment': 'عميل متنامي', 'color': '#fbbf24', 'reason': 'نمو تدريجي في القيمة والطلبات'}
-    
-    # Potential Customer: Low frequency but good order value
-    if avg_value > 500 and orders > 10:
-        return {'segment': 'عميل واعد', 'color': '#f97316', 'reason': 'قيمة طلب عالية مع أوامر محدودة'}
-    
-    # Active Customer: Regular orders
-    if orders > 50:
-        return {'segment': 'عميل نشط', 'color': '#8b5cf6', 'reason': 'عدد طلبات جيد'}
-    
-    # Occasional Customer: Few orders but reasonable value
-    if orders > 10 and gmv > 10000:
-        return {'segment': 'عميل عارض', 'color': '#a78bfa', 'reason': 'طلبات قليلة لكن بقيم جيدة'}
-    
-    # New Customer: Just starting
-    if orders <= 10:
-        return {'segment': 'عميل جديد', 'color': '#71717a', 'reason': 'عدد طلبات قليل جداً'}
-    
-    # Default
-    return {'segment': 'عميل عادي', 'color': '#9ca3af', 'reason': 'عميل قياسي'}
-
 # Read the cleaned data
-df = pd.read_csv('data_cleaned.csv', sep='\t', encoding='utf-8')
+df = load_table('data_cleaned.csv', sep='\t', encoding='utf-8')
+
+# Flag mistyped prices before they feed GMV, then apply PRICE_POLICY
+price_anomalies = detect_price_anomalies(df)
+anomaly_report(df, price_anomalies).to_csv(ANOMALY_FILE, index=False, encoding='utf-8')
+price_anomaly_count = int(price_anomalies['price_anomaly'].sum())
+df = apply_price_policy(df, price_anomalies, PRICE_POLICY)
+
+# Typed order lines (dates parsed once) for the vectorized stages
+order_lines = prepare_order_lines(df)
+
+# Order-level fact table (one typed row per order)
+order_facts = build_orders(order_lines)
+save_orders(order_facts, ORDERS_FILE)
+order_summary = order_metrics(order_facts)
+
+# Month/city-partitioned Parquet copy of the order lines for filtered reads
+# (rewritten only when data_cleaned.csv or the price policy changed)
+if is_current(PARTITION_DIR, 'data_cleaned.csv', PRICE_POLICY):
+    partition_stats = load_stats(PARTITION_DIR)['partitions']
+else:
+    partition_stats = write_partitions(order_lines, PARTITION_DIR, source='data_cleaned.csv', key=PRICE_POLICY)
+
+# Indexed SQLite copy of the order lines and profiles (reloads only changed sources)
+if BUILD_WAREHOUSE:
+    warehouse = open_warehouse(WAREHOUSE_FILE)
+    refresh_warehouse(warehouse)
+    warehouse.close()
+
+# Recency, frequency and monetary scores per customer
+rfm_by_name = rfm_records(build_rfm(order_lines))
+
+# Order cadence and churn risk per customer, plus the at-risk list per area
+churn = build_churn(order_lines)
+churn.to_csv(CHURN_FILE, encoding='utf-8')
+churn_by_name = churn_records(churn)
+churn_by_area = at_risk_by_area(churn)
+
+# ABC classes and Pareto curves for customers, products, brands and areas
+abc_summaries, abc_tables = build_abc(order_lines)
+save_abc_csv(abc_tables, ABC_FILE)
+abc_class_by_name = abc_tables['customers']['abc_class'].to_dict()
+
+# Similar customers and suggested next products (customer × base_id collaborative filtering)
+recommendations_by_name = build_recommendations(order_lines)
+save_recommendations(recommendations_by_name, RECOMMENDATIONS_FILE)
 
 # Process customer data
+# (not read from customer_state.db: the payload is keyed by name, counts products
+# per line and ships every order's items, none of which the state store keeps)
 customers_data = defaultdict(lambda: {
     'phone': '',
     'area': '',
@@ -136,7 +173,7 @@ customers_data = defaultdict(lambda: {
 for _, row in df.iterrows():
     customer_name = row['name']
     
-    customers_data[customer_name]['phone'] = row['phone']
+    customers_data[customer_name]['phone'] = row['phone'] if pd.notna(row['phone']) else ''
     customers_data[customer_name]['area'] = row['area'] if pd.notna(row['area']) else 'غير محدد'
     customers_data[customer_name]['city'] = row['city'] if pd.notna(row['city']) else 'غير محدد'
     customers_data[customer_name]['type'] = row['Type'] if pd.notna(row['Type']) else 'غير محدد'
@@ -203,14 +240,22 @@ for name, data in customers_data.items():
         'brands': dict(data['brands']),
         'orders': orders_list
     }
+    customer_obj.update(rfm_by_name.get(name, {}))
+    customer_obj.update(churn_by_name.get(name, {}))
+    customer_obj['abc_class'] = abc_class_by_name.get(name)
+    customer_obj.update(recommendations_by_name.get(str(name), {}))
     
-    # Customer Segmentation
-    segmentation = classify_customer(customer_obj)
-    customer_obj['segment'] = segmentation['segment']
+    customers_list.append(customer_obj)
+
+# Quantile sketches of the customer metrics (used by the adaptive segmentation mode)
+metric_sketches = build_metric_sketches(customer_metrics(customers_list))
+save_metric_sketches(metric_sketches, QUANTILES_FILE)
+
+# Customer Segmentation (vectorized over all customers at once)
+for customer_obj, segmentation in zip(customers_list, classify_customers(customers_list, sketches=metric_sketches)):
+    customer_obj['segment'] = segmentation['name']
     customer_obj['segment_color'] = segmentation['color']
     customer_obj['segment_reason'] = segmentation['reason']
-    
-    customers_list.append(customer_obj)
 
 customers_list.sort(key=lambda x: x['total_gmv'], reverse=True)
 
@@ -222,59 +267,39 @@ total_items = sum(c['item_count'] for c in customers_list)
 unique_products = len(df['product'].unique())
 unique_brands = len(df['brand'].unique())
 
-# Group by Area (Top 10 customers per area)
-area_groups = defaultdict(list)
-for customer in customers_list:
-    area = customer['area']
-    area_groups[area].append(customer)
+# Group by Area and City, keeping the top K customers per group
+area_top = grouped_top_k(customers_list, 'area', 'total_gmv', TOP_K_PER_LEVEL['area'],
+                         TOP_K_OVERRIDES.get('area'))
+city_top = grouped_top_k(customers_list, 'city', 'total_gmv', TOP_K_PER_LEVEL['city'],
+                         TOP_K_OVERRIDES.get('city'))
 
-# Sort each area by GMV and get top 10
-for area in area_groups:
-    area_groups[area] = sorted(area_groups[area], key=lambda x: x['total_gmv'], reverse=True)[:10]
+area_groups = {area: info['items'] for area, info in area_top.items()}
+city_groups = {city: info['items'] for city, info in city_top.items()}
 
 # Convert to list format for JavaScript with aggregated data
 area_groups_sorted = []
-for area, customers in sorted(area_groups.items(), key=lambda x: sum(c['total_gmv'] for c in x[1]), reverse=True):
+for area, info in rank_groups(area_top):
     area_groups_sorted.append({
         'name': area,
-        'customers': customers,
-        'gmv': sum(c['total_gmv'] for c in customers)
+        'customers': info['items'],
+        'gmv': info['top_total'],
+        'total_gmv': round(info['total'], 2),
+        'customer_count': info['count']
     })
 
-# Group by City (Top 50 customers per city)
-city_groups = defaultdict(list)
-for customer in customers_list:
-    city = customer['city']
-    city_groups[city].append(customer)
-
-# Sort each city by GMV and get top 50
-for city in city_groups:
-    city_groups[city] = sorted(city_groups[city], key=lambda x: x['total_gmv'], reverse=True)[:50]
-
-# Convert to list format for JavaScript with aggregated data
 city_groups_sorted = []
-for city, customers in sorted(city_groups.items(), key=lambda x: sum(c['total_gmv'] for c in x[1]), reverse=True):
+for city, info in rank_groups(city_top):
     city_groups_sorted.append({
         'name': city,
-        'customers': customers,
-        'gmv': sum(c['total_gmv'] for c in customers)
+        'customers': info['items'],
+        'gmv': info['top_total'],
+        'total_gmv': round(info['total'], 2),
+        'customer_count': info['count']
     })
 
 # Customer Segments Analysis
 segments_count = defaultdict(int)
 segments_gmv = defaultdict(float)
-segment_colors = {
-    'عميل مميز': '#4ade80',
-    'عميل فئة أولى': '#60a5fa',
-    'عميل وفي': '#34d399',
-    'عميل متنامي': '#fbbf24',
-    'عميل واعد': '#f97316',
-    'عميل نشط': '#8b5cf6',
-    'عميل عارض': '#a78bfa',
-    'عميل جديد': '#ec4899',
-    'عميل عادي': '#64748b'
-}
-
 for customer in customers_list:
     seg = customer['segment']
     segments_count[seg] += 1
@@ -282,22 +307,59 @@ for customer in customers_list:
 
 # Create segments distribution list for JavaScript
 segments_distribution = []
-for segment in segment_colors.keys():
-    if segment in segments_count:
+for segment in SEGMENTS + [DEFAULT_SEGMENT]:
+    if segment['name'] in segments_count:
         segments_distribution.append({
-            'name': segment,
-            'color': segment_colors[segment],
-            'count': segments_count[segment],
-            'gmv': segments_gmv[segment]
+            'name': segment['name'],
+            'color': segment['color'],
+            'count': segments_count[segment['name']],
+            'gmv': segments_gmv[segment['name']]
         })
 
 # Top Areas by GMV
-top_areas_by_gmv = sorted([(area, sum(c['total_gmv'] for c in customers)) for area, customers in area_groups.items()], 
-                           key=lambda x: x[1], reverse=True)[:10]
+top_areas_by_gmv = [(area, info['top_total']) for area, info in rank_groups(area_top, limit=10)]
 
 # Top Cities by GMV
-top_cities_by_gmv = sorted([(city, sum(c['total_gmv'] for c in customers)) for city, customers in city_groups.items()], 
-                            key=lambda x: x[1], reverse=True)[:10]
+top_cities_by_gmv = [(city, info['top_total']) for city, info in rank_groups(city_top, limit=10)]
+
+# Rollup cube (city × area × Type × segment × month) for reports
+segment_by_name = {c['name']: c['segment'] for c in customers_list}
+order_lines['segment'] = segment_lines(order_lines, segment_by_name)
+save_cube(build_cube(order_lines), CUBE_FILE, source='data_cleaned.csv')
+
+# Order-value t-digests per area, city and segment (percentiles are read from them in the dashboard)
+order_value_sketches = build_order_value_sketches(order_lines)
+save_order_value_sketches(order_value_sketches, ORDER_VALUE_FILE)
+
+# Daily, weekly and monthly GMV series per customer, area, city and segment
+time_series = build_all_series(order_lines)
+
+# Next-months GMV forecasts per area and city (complete months only)
+forecasts = build_forecasts(time_series, order_lines['order_date'].max())
+forecast_frame(forecasts).to_csv(FORECAST_FILE, index=False, encoding='utf-8')
+
+# Monthly acquisition cohorts and retention
+cohorts = build_cohorts(order_lines)
+save_cohorts_csv(cohorts, COHORT_FILE)
+
+# Products and brands bought in the same order (full per-item partners go to BASKET_FILE)
+market_basket = build_market_basket(order_lines)
+save_market_basket(market_basket, BASKET_FILE)
+basket_top_pairs = {level: result['top_pairs'] for level, result in market_basket.items()}
+
+# Brand and category leaderboards (full tables to LEADERBOARD_FILE, top 50 to the dashboard)
+leaderboards = build_leaderboards(order_lines)
+save_leaderboards(leaderboards, LEADERBOARD_FILE)
+for level in ('brands', 'categories'):
+    if level in leaderboards:
+        leaderboards[level]['rows'] = leaderboards[level]['rows'][:50]
+
+# Distribution-route performance (route from the line or the retailer profiles' phone lookup)
+order_lines = attach_routes(order_lines)
+route_performance, route_days = build_route_performance(order_lines)
+route_performance.to_csv(ROUTE_FILE, encoding='utf-8')
+route_days.to_csv(ROUTE_DAY_FILE, encoding='utf-8')
+route_summary = route_records(route_performance)
 
 # Average metrics
 avg_gmv = total_gmv / total_customers if total_customers > 0 else 0
@@ -1013,7 +1075,7 @@ html = '''<!DOCTYPE html>
 
         <div class="segment-section">
             <div class="segment-header">
-                <h2>� تحليل العملاء حسب المنطقة (أفضل 10 عملاء لكل منطقة)</h2>
+                <h2>� تحليل العملاء حسب المنطقة (أفضل ''' + str(TOP_K_PER_LEVEL['area']) + ''' عملاء لكل منطقة)</h2>
             </div>
             <div class="group-table-container">
                 <table class="group-table">
@@ -1023,6 +1085,8 @@ html = '''<!DOCTYPE html>
                             <th>عدد العملاء</th>
                             <th>إجمالي GMV</th>
                             <th>متوسط GMV للعميل</th>
+                            <th>وسيط قيمة الطلب</th>
+                            <th>P90 قيمة الطلب</th>
                             <th>أفضل عميل</th>
                             <th>GMV أفضل عميل</th>
                         </tr>
@@ -1035,7 +1099,7 @@ html = '''<!DOCTYPE html>
 
         <div class="segment-section">
             <div class="segment-header">
-                <h2>🏙️ تحليل العملاء حسب المدينة (أفضل 50 عميل لكل مدينة)</h2>
+                <h2>🏙️ تحليل العملاء حسب المدينة (أفضل ''' + str(TOP_K_PER_LEVEL['city']) + ''' عميل لكل مدينة)</h2>
             </div>
             <div class="group-table-container">
                 <table class="group-table">
@@ -1045,6 +1109,8 @@ html = '''<!DOCTYPE html>
                             <th>عدد العملاء</th>
                             <th>إجمالي GMV</th>
                             <th>متوسط GMV للعميل</th>
+                            <th>وسيط قيمة الطلب</th>
+                            <th>P90 قيمة الطلب</th>
                             <th>أفضل عميل</th>
                             <th>GMV أفضل عميل</th>
                         </tr>
@@ -1063,6 +1129,225 @@ html = '''<!DOCTYPE html>
             </div>
         </div>
 
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>📅 اتجاه المبيعات الشهرية</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>الشهر</th>
+                            <th>إجمالي GMV</th>
+                            <th>عدد الطلبات</th>
+                        </tr>
+                    </thead>
+                    <tbody id="monthlyTrendBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>🔮 توقعات GMV للشهر القادم</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المنطقة</th>
+                            <th>GMV آخر شهر مكتمل</th>
+                            <th>توقع الشهر القادم</th>
+                            <th>نطاق 80%</th>
+                            <th>نطاق 95%</th>
+                        </tr>
+                    </thead>
+                    <tbody id="areaForecastBody">
+                    </tbody>
+                </table>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المدينة</th>
+                            <th>GMV آخر شهر مكتمل</th>
+                            <th>توقع الشهر القادم</th>
+                            <th>نطاق 80%</th>
+                            <th>نطاق 95%</th>
+                        </tr>
+                    </thead>
+                    <tbody id="cityForecastBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>🔁 الاحتفاظ بالعملاء حسب شهر أول طلب</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead id="cohortTableHead">
+                    </thead>
+                    <tbody id="cohortTableBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>📐 تحليل باريتو (ABC)</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المستوى</th>
+                            <th>العدد</th>
+                            <th>فئة A</th>
+                            <th>فئة B</th>
+                            <th>فئة C</th>
+                            <th>حصة أعلى 20% من GMV</th>
+                        </tr>
+                    </thead>
+                    <tbody id="abcSummaryBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>⚠️ عملاء معرضون للتوقف حسب المنطقة</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المنطقة</th>
+                            <th>اسم العميل</th>
+                            <th>درجة الخطر</th>
+                            <th>أيام منذ آخر طلب</th>
+                            <th>معدل الطلب المعتاد (يوم)</th>
+                            <th>إجمالي GMV</th>
+                        </tr>
+                    </thead>
+                    <tbody id="churnRiskBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>🏆 ترتيب العلامات التجارية والفئات</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>العلامة التجارية</th>
+                            <th>إجمالي GMV</th>
+                            <th>الكمية</th>
+                            <th>العملاء</th>
+                            <th>المناطق</th>
+                        </tr>
+                    </thead>
+                    <tbody id="brandLeaderboardBody">
+                    </tbody>
+                </table>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>الفئة</th>
+                            <th>إجمالي GMV</th>
+                            <th>الكمية</th>
+                            <th>العملاء</th>
+                            <th>المناطق</th>
+                        </tr>
+                    </thead>
+                    <tbody id="categoryLeaderboardBody">
+                    </tbody>
+                </table>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المنطقة</th>
+                            <th>أعلى العلامات التجارية (GMV)</th>
+                        </tr>
+                    </thead>
+                    <tbody id="brandsByAreaBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>🚚 أداء خطوط التوزيع</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>خط التوزيع</th>
+                            <th>إجمالي GMV</th>
+                            <th>العملاء النشطون</th>
+                            <th>الطلبات لكل عميل</th>
+                            <th>متوسط قيمة الزيارة</th>
+                            <th>أيام التشغيل</th>
+                        </tr>
+                    </thead>
+                    <tbody id="routePerformanceBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
+        <div class="segment-section">
+            <div class="segment-header">
+                <h2>🛒 منتجات تُشترى معاً</h2>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>المنتج</th>
+                            <th>يُشترى مع</th>
+                            <th>طلبات مشتركة</th>
+                            <th>الثقة</th>
+                            <th>Lift</th>
+                        </tr>
+                    </thead>
+                    <tbody id="productPairsBody">
+                    </tbody>
+                </table>
+            </div>
+            <div class="group-table-container">
+                <table class="group-table">
+                    <thead>
+                        <tr>
+                            <th>الماركة</th>
+                            <th>تُشترى مع</th>
+                            <th>طلبات مشتركة</th>
+                            <th>الثقة</th>
+                            <th>Lift</th>
+                        </tr>
+                    </thead>
+                    <tbody id="brandPairsBody">
+                    </tbody>
+                </table>
+            </div>
+        </div>
+
         <div class="segment-section">
             <div class="segment-header">
                 <h2>�📊 تحليل شامل لجميع العملاء</h2>
@@ -1121,12 +1406,55 @@ html = '''<!DOCTYPE html>
                 renderAreaGroupsTable();
                 renderCityGroupsTable();
                 renderSegmentDistribution();
+                renderMonthlyTrend();
+                renderForecastTable('area', 'areaForecastBody');
+                renderForecastTable('city', 'cityForecastBody');
+                renderCohortTable();
+                renderAbcTable();
+                renderChurnTable();
+                renderRouteTable();
+                renderLeaderboard('brands', 'brandLeaderboardBody');
+                renderLeaderboard('categories', 'categoryLeaderboardBody');
+                renderBrandsByArea();
+                renderBasketTable('products', 'productPairsBody');
+                renderBasketTable('brands', 'brandPairsBody');
                 renderTable();
             } else {
                 setTimeout(waitForDataAndRender, 100);
             }
         }
 
+        // Value at quantile q of a serialized t-digest (mirrors TDigest.quantile in sketches.py)
+        function digestQuantile(digest, q) {
+            if (!digest || digest.means.length === 0) return null;
+            const positions = [0];
+            const values = [digest.min];
+            let total = 0;
+            digest.means.forEach((mean, i) => {
+                positions.push(total + digest.weights[i] / 2);
+                values.push(mean);
+                total += digest.weights[i];
+            });
+            positions.push(total);
+            values.push(digest.max);
+
+            const target = q * total;
+            for (let i = 1; i < positions.length; i++) {
+                if (target <= positions[i]) {
+                    const span = positions[i] - positions[i - 1];
+                    const t = span > 0 ? (target - positions[i - 1]) / span : 0;
+                    return values[i - 1] + t * (values[i] - values[i - 1]);
+                }
+            }
+            return digest.max;
+        }
+
+        function formatOrderValue(level, group, q) {
+            if (typeof orderValueData === 'undefined' || !orderValueData[level]) return 'N/A';
+            const value = digestQuantile(orderValueData[level][group], q);
+            return value === null ? 'N/A' : `${value.toLocaleString('ar', {maximumFractionDigits: 0})} EGP`;
+        }
+
         // Render Area Groups Table
         function renderAreaGroupsTable() {
             const tbody = document.getElementById('areaTableBody');
@@ -1145,6 +1473,8 @@ html = '''<!DOCTYPE html>
                     <td>${area.customers.length}</td>
                     <td>${area.gmv.toLocaleString('ar')} EGP</td>
                     <td>${avgGmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${formatOrderValue('area', area.name, 0.5)}</td>
+                    <td>${formatOrderValue('area', area.name, 0.9)}</td>
                     <td>${topCustomer ? topCustomer.name : 'N/A'}</td>
                     <td>${topCustomer ? topCustomer.total_gmv.toLocaleString('ar') : '0'} EGP</td>
                 `;
@@ -1170,6 +1500,8 @@ html = '''<!DOCTYPE html>
                     <td>${city.customers.length}</td>
                     <td>${city.gmv.toLocaleString('ar')} EGP</td>
                     <td>${avgGmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${formatOrderValue('city', city.name, 0.5)}</td>
+                    <td>${formatOrderValue('city', city.name, 0.9)}</td>
                     <td>${topCustomer ? topCustomer.name : 'N/A'}</td>
                     <td>${topCustomer ? topCustomer.total_gmv.toLocaleString('ar') : '0'} EGP</td>
                 `;
@@ -1210,6 +1542,10 @@ html = '''<!DOCTYPE html>
                         <label>إجمالي GMV</label>
                         <div class="value" style="font-size: 0.95rem;">${segment.gmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</div>
                     </div>
+                    <div class="segment-card-stat">
+                        <label>وسيط / P90 قيمة الطلب</label>
+                        <div class="value" style="font-size: 0.95rem;">${formatOrderValue('segment', segment.name, 0.5)} / ${formatOrderValue('segment', segment.name, 0.9)}</div>
+                    </div>
                     <div class="segment-card-stat">
                         <label>متوسط GMV</label>
                         <div class="value" style="font-size: 0.95rem;">${(segment.gmv / segment.count).toLocaleString('ar', {maximumFractionDigits: 0})} EGP</div>
@@ -1219,6 +1555,220 @@ html = '''<!DOCTYPE html>
             });
         }
 
+        // Render Monthly Trend Table (sums the segment-level monthly series)
+        function renderMonthlyTrend() {
+            const tbody = document.getElementById('monthlyTrendBody');
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof timeSeriesData === 'undefined' || !timeSeriesData.monthly || !timeSeriesData.monthly.segment) return;
+
+            const series = timeSeriesData.monthly.segment;
+            const gmv = new Array(series.periods.length).fill(0);
+            const orders = new Array(series.periods.length).fill(0);
+            series.period_index.forEach((periodIdx, i) => {
+                gmv[periodIdx] += series.gmv[i];
+                orders[periodIdx] += series.orders[i];
+            });
+
+            series.periods.forEach((period, idx) => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${period}</td>
+                    <td>${gmv[idx].toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${orders[idx]}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render next-month GMV forecasts of one level, largest first
+        function renderForecastTable(level, tbodyId) {
+            const tbody = document.getElementById(tbodyId);
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof forecastData === 'undefined' || !forecastData[level]) return;
+
+            const data = forecastData[level];
+            const money = value => `${value.toLocaleString('ar', {maximumFractionDigits: 0})} EGP`;
+            const order = data.keys.map((key, idx) => idx).sort((a, b) => data.forecast[b][0] - data.forecast[a][0]);
+            order.forEach(idx => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${data.keys[idx]}</td>
+                    <td>${money(data.last_gmv[idx])}</td>
+                    <td>${money(data.forecast[idx][0])}</td>
+                    <td>${money(data.lower_80[idx][0])} - ${money(data.upper_80[idx][0])}</td>
+                    <td>${money(data.lower_95[idx][0])} - ${money(data.upper_95[idx][0])}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render Cohort Retention Table (% of each cohort still ordering N months later)
+        function renderCohortTable() {
+            const thead = document.getElementById('cohortTableHead');
+            const tbody = document.getElementById('cohortTableBody');
+            if (!thead || !tbody) return;
+            thead.innerHTML = '';
+            tbody.innerHTML = '';
+
+            if (typeof cohortData === 'undefined' || !cohortData.cohorts || cohortData.cohorts.length === 0) return;
+
+            thead.innerHTML = `
+                <tr>
+                    <th>شهر أول طلب</th>
+                    <th>عدد العملاء</th>
+                    ${cohortData.offsets.map(offset => `<th>+${offset}</th>`).join('')}
+                </tr>
+            `;
+
+            cohortData.cohorts.forEach((cohort, idx) => {
+                const row = document.createElement('tr');
+                const cells = cohortData.retention[idx].map(value => value === null
+                    ? '<td></td>'
+                    : `<td style="background: rgba(96, 165, 250, ${(value / 100).toFixed(2)});">${value}%</td>`
+                ).join('');
+                row.innerHTML = `
+                    <td>${cohort}</td>
+                    <td>${cohortData.sizes[idx]}</td>
+                    ${cells}
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render ABC class counts (with their GMV share) per level
+        function renderAbcTable() {
+            const tbody = document.getElementById('abcSummaryBody');
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof abcData === 'undefined') return;
+
+            const levelNames = {customers: 'العملاء', products: 'المنتجات', brands: 'العلامات التجارية', areas: 'المناطق'};
+            Object.entries(abcData).forEach(([level, summary]) => {
+                const classCell = label => `<td>${summary.counts[label]} (${(summary.gmv_share[label] * 100).toFixed(1)}%)</td>`;
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${levelNames[level] || level}</td>
+                    <td>${summary.items}</td>
+                    ${classCell('A')}
+                    ${classCell('B')}
+                    ${classCell('C')}
+                    <td>${(summary.top_20_share * 100).toFixed(1)}%</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render at-risk customers (current gap far above their usual cadence) per area
+        function renderChurnTable() {
+            const tbody = document.getElementById('churnRiskBody');
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof churnData === 'undefined') return;
+
+            Object.entries(churnData).forEach(([area, customers]) => {
+                customers.forEach(customer => {
+                    const row = document.createElement('tr');
+                    row.innerHTML = `
+                        <td>${area}</td>
+                        <td>${customer.name}</td>
+                        <td style="color: ${customer.risk === 'high' ? '#ef4444' : '#f59e0b'};">${customer.risk === 'high' ? 'مرتفع' : 'متوسط'}</td>
+                        <td>${customer.days_since_last_order}</td>
+                        <td>${customer.typical_gap_days}</td>
+                        <td>${customer.gmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    `;
+                    tbody.appendChild(row);
+                });
+            });
+        }
+
+        // Render a brand/category leaderboard (rows follow leaderboardData[level].columns)
+        function renderLeaderboard(level, tbodyId) {
+            const tbody = document.getElementById(tbodyId);
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof leaderboardData === 'undefined' || !leaderboardData[level]) return;
+
+            leaderboardData[level].rows.forEach(([key, gmv, quantity, customers, areas]) => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${key}</td>
+                    <td>${gmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${quantity.toLocaleString('ar', {maximumFractionDigits: 0})}</td>
+                    <td>${customers}</td>
+                    <td>${areas}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render the top brands of every area
+        function renderBrandsByArea() {
+            const tbody = document.getElementById('brandsByAreaBody');
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof leaderboardData === 'undefined' || !leaderboardData.brands_by_area) return;
+
+            Object.entries(leaderboardData.brands_by_area).forEach(([area, brands]) => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${area}</td>
+                    <td>${brands.map(([brand, gmv]) => `${brand} (${gmv.toLocaleString('ar', {maximumFractionDigits: 0})})`).join('، ')}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render per-route GMV, reach and drop size
+        function renderRouteTable() {
+            const tbody = document.getElementById('routePerformanceBody');
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof routeData === 'undefined') return;
+
+            routeData.forEach(route => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${route.route}</td>
+                    <td>${route.gmv.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${route.customers}</td>
+                    <td>${route.orders_per_customer}</td>
+                    <td>${route.avg_drop_size.toLocaleString('ar', {maximumFractionDigits: 0})} EGP</td>
+                    <td>${route.active_days}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
+        // Render the most frequent pairs of a market basket level
+        function renderBasketTable(level, tbodyId) {
+            const tbody = document.getElementById(tbodyId);
+            if (!tbody) return;
+            tbody.innerHTML = '';
+
+            if (typeof basketData === 'undefined' || !basketData[level]) return;
+
+            basketData[level].forEach(pair => {
+                const row = document.createElement('tr');
+                row.innerHTML = `
+                    <td>${pair.a_label}</td>
+                    <td>${pair.label}</td>
+                    <td>${pair.orders}</td>
+                    <td>${(pair.confidence * 100).toFixed(1)}%</td>
+                    <td>${pair.lift.toFixed(2)}</td>
+                `;
+                tbody.appendChild(row);
+            });
+        }
+
         function renderTable() {
             const tbody = document.getElementById('customersTableBody');
             if (!tbody) return;
@@ -1368,6 +1918,30 @@ html = '''<!DOCTYPE html>
                                     <label>عدد أيام الشراء:</label>
                                     <span class="value">${customer.unique_dates}</span>
                                 </div>
+                                <div class="detail-item">
+                                    <label>آخر طلب:</label>
+                                    <span class="value">${customer.last_order_date || 'غير متوفر'}${customer.recency_days != null ? ` (منذ ${customer.recency_days} يوم)` : ''}</span>
+                                </div>
+                                <div class="detail-item">
+                                    <label>تقييم RFM:</label>
+                                    <span class="value">${customer.rfm_score || 'غير متوفر'}</span>
+                                </div>
+                                <div class="detail-item">
+                                    <label>فئة ABC:</label>
+                                    <span class="value">${customer.abc_class || 'غير متوفر'}</span>
+                                </div>
+                                <div class="detail-item">
+                                    <label>معدل الطلب المعتاد:</label>
+                                    <span class="value">${customer.typical_gap_days != null ? `كل ${customer.typical_gap_days} يوم` : 'غير متوفر'}${customer.churn_risk ? ` (خطر توقف: ${customer.churn_risk === 'high' ? 'مرتفع' : 'متوسط'})` : ''}</span>
+                                </div>
+                                <div class="detail-item">
+                                    <label>منتجات مقترحة:</label>
+                                    <span class="value">${(customer.suggested_products || []).map(p => p.product).join('، ') || 'غير متوفر'}</span>
+                                </div>
+                                <div class="detail-item">
+                                    <label>عملاء مشابهون:</label>
+                                    <span class="value">${(customer.similar_customers || []).map(c => c.name).join('، ') || 'غير متوفر'}</span>
+                                </div>
                             </div>
                         </div>
 
@@ -1519,6 +2093,15 @@ const customersData = {json.dumps(customers_list, ensure_ascii=False)};
 const areaGroupsData = {json.dumps(area_groups_sorted, ensure_ascii=False)};
 const cityGroupsData = {json.dumps(city_groups_sorted, ensure_ascii=False)};
 const segmentsData = {json.dumps(segments_distribution, ensure_ascii=False)};
+const timeSeriesData = {json.dumps(time_series, ensure_ascii=False)};
+const forecastData = {json.dumps(forecasts, ensure_ascii=False)};
+const cohortData = {json.dumps(cohorts, ensure_ascii=False)};
+const basketData = {json.dumps(basket_top_pairs, ensure_ascii=False)};
+const churnData = {json.dumps(churn_by_area, ensure_ascii=False)};
+const abcData = {json.dumps(abc_summaries, ensure_ascii=False)};
+const routeData = {json.dumps(route_summary, ensure_ascii=False)};
+const leaderboardData = {json.dumps(leaderboards, ensure_ascii=False)};
+const orderValueData = {json.dumps(sketches_to_dict(order_value_sketches), ensure_ascii=False)};
 """
 
 with open('dashboard_data.js', 'w', encoding='utf-8') as f:
@@ -1535,3 +2118,18 @@ print(f"📦 Total unique orders: {total_unique_orders:,}")
 print(f"🎯 Pagination: 25 customers per page")
 print(f"📁 Data file: dashboard_data.js (external)")
 print(f"🌐 HTML file: horeca_modern_dashboard.html")
+print(f"🧾 Orders: {ORDERS_FILE} (AOV {order_summary['aov']:,.2f} EGP, {order_summary['avg_lines']} lines per order)")
+print(f"🗂️ Partitioned order lines: {PARTITION_DIR}/ ({len(partition_stats):,} month/city partitions)")
+print(f"🧊 Rollup cube: {CUBE_FILE}")
+print(f"🔮 GMV forecasts: {FORECAST_FILE}")
+print(f"🔁 Cohort retention: {COHORT_FILE}")
+print(f"🛒 Market basket: {BASKET_FILE}")
+print(f"🤝 Recommendations: {RECOMMENDATIONS_FILE}")
+print(f"⚠️ Churn risk: {CHURN_FILE}")
+print(f"📐 ABC classes: {ABC_FILE}")
+print(f"🚚 Route performance: {ROUTE_FILE}, {ROUTE_DAY_FILE}")
+print(f"🏆 Leaderboards: {LEADERBOARD_FILE}")
+print(f"📊 Order-value sketches: {ORDER_VALUE_FILE}")
+if BUILD_WAREHOUSE:
+    print(f"🗄️ Warehouse: {WAREHOUSE_FILE}")
+print(f"🔎 Price anomalies: {price_anomaly_count:,} lines ({PRICE_POLICY}), report in {ANOMALY_FILE}")
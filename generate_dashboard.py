@@ -3,6 +3,8 @@ import json
 import re
 from collections import defaultdict
 
+from schema import load_table
+
 print("=" * 60)
 print("HORECA DATA PROCESSING & ANALYSIS")
 print("=" * 60)
@@ -10,7 +12,7 @@ print("=" * 60)
 # Read the CSV file
 print("\n[1/5] Reading data...")
 try:
-    df = pd.read_csv('data.csv', sep='\t', encoding='utf-8')
+    df = load_table('data.csv', categories=False, sep='\t', encoding='utf-8')
     print(f"✓ Loaded {len(df)} records")
 except Exception as e:
     print(f"✗ Error: {e}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Brand and category leaderboards with per-area breakdowns
+Brand, category and area become categorical codes, so each leaderboard is
+one grouped aggregation (GMV, quantity, distinct customers and areas).
+Results are stored column-wise ({'columns': [...], 'rows': [[...]]}) to
+keep the dashboard payload small.
+"""
+import json
+import numbers
+import sys
+
+import pandas as pd
+
+from order_lines import fill_missing
+
+LEADERBOARD_FILE = 'leaderboards.json'
+
+# Leaderboard -> order-line column
+LEADERBOARD_LEVELS = {
+    'brands': 'brand',
+    'categories': 'category',
+}
+
+LEADERBOARD_COLUMNS = ('key', 'gmv', 'quantity', 'customers', 'areas')
+TOP_PER_AREA = 5
+
+
+def _typed(lines, columns):
+    """Just the needed columns, with the grouping ones as categoricals"""
+    typed = lines[list(columns) + ['gmv', 'amount']].copy()
+    for column in columns:
+        typed[column] = fill_missing(typed[column]).astype(str).astype('category')
+    return typed
+
+
+def _cell(value):
+    """Counts as int (Python or numpy integers), any other number rounded to 2 decimals"""
+    return int(value) if isinstance(value, numbers.Integral) else round(float(value), 2)
+
+
+def _table(frame, columns):
+    return {
+        'columns': list(columns),
+        'rows': [[row[0]] + [_cell(v) for v in row[1:]]
+                 for row in frame[list(columns)].itertuples(index=False, name=None)]
+    }
+
+
+def leaderboard(lines, column, customer_key='name'):
+    """DataFrame of GMV, quantity, distinct customers and distinct areas per value of column, by GMV"""
+    typed = _typed(lines, [column, 'area']).assign(customer=lines[customer_key].astype(str).to_numpy())
+    board = typed.groupby(column, observed=True).agg(
+        gmv=('gmv', 'sum'),
+        quantity=('amount', 'sum'),
+        customers=('customer', 'nunique'),
+        areas=('area', 'nunique')
+    )
+    return board.sort_values('gmv', ascending=False).rename_axis('key').reset_index()
+
+
+def top_per_area(lines, column, limit=TOP_PER_AREA):
+    """{area: top `limit` values of column by GMV}"""
+    typed = _typed(lines, ['area', column])
+    cells = typed.groupby(['area', column], observed=True)['gmv'].sum().reset_index()
+    cells = cells.sort_values(['area', 'gmv'], ascending=[True, False])
+    cells = cells[cells.groupby('area', observed=True).cumcount() < limit]
+    ranked = {}
+    for area, key, gmv in cells.itertuples(index=False, name=None):
+        ranked.setdefault(str(area), []).append([str(key), round(float(gmv), 2)])
+    return ranked
+
+
+def build_leaderboards(lines, limit=None):
+    """Leaderboards for every level in LEADERBOARD_LEVELS (first `limit` rows each) and top brands per area"""
+    boards = {}
+    for level, column in LEADERBOARD_LEVELS.items():
+        if column in lines.columns:
+            board = leaderboard(lines, column)
+            boards[level] = _table(board.head(limit) if limit else board, LEADERBOARD_COLUMNS)
+    if 'brand' in lines.columns:
+        boards['brands_by_area'] = top_per_area(lines, 'brand')
+    return boards
+
+
+def save_leaderboards(boards, path=LEADERBOARD_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(boards, f, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    boards = build_leaderboards(lines)
+    save_leaderboards(boards)
+
+    for level in LEADERBOARD_LEVELS:
+        if level in boards:
+            print(f"{level}: {len(boards[level]['rows']):,}")
+            for row in boards[level]['rows'][:5]:
+                print(f"  {row[0]}: GMV {row[1]:,.2f}, {row[3]:,} customers, {row[4]:,} areas")
+    print(f"✅ Leaderboards saved to {LEADERBOARD_FILE}")
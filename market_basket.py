@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Market basket analysis: which products and brands are bought in the same order
+A binary order × item sparse matrix X gives every pair's co-occurrence count
+as X.T @ X (the diagonal holds each item's order count); support, confidence
+and lift follow from it without visiting pairs one by one
+"""
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+BASKET_FILE = 'market_basket.json'
+TOP_PAIRS = 10
+TOP_OVERALL = 20
+MIN_PAIR_ORDERS = 2
+
+# Basket level -> (item column, label column)
+BASKET_LEVELS = {
+    'products': ('base_id', 'product'),
+    'brands': ('brand', 'brand'),
+}
+
+
+def json_key(value):
+    """Plain Python key for JSON (base_id is read as float)"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return int(value)
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def incidence_matrix(lines, item_key, order_key='order_id'):
+    """Binary order × item CSR matrix, the item keys and the lines that have an item"""
+    valid = lines[lines[item_key].notna()]
+    orders, order_ids = pd.factorize(valid[order_key].astype(str))
+    items, keys = pd.factorize(valid[item_key])
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(items), dtype=np.int32), (orders, items)),
+        shape=(len(order_ids), len(keys))
+    )
+    # An item on several lines of one order counts once
+    matrix.data[:] = 1
+    return matrix, keys, valid
+
+
+def item_labels(valid, item_key, label_key, keys):
+    """Most common label for every item key"""
+    if item_key == label_key:
+        return [str(key) for key in keys]
+    counts = valid.groupby([item_key, label_key], observed=True).size().sort_values(ascending=False)
+    best = counts.reset_index().drop_duplicates(item_key).set_index(item_key)[label_key]
+    return [str(best.get(key, key)) for key in keys]
+
+
+def pair_metrics(counts, n_orders, min_orders=MIN_PAIR_ORDERS):
+    """Directed pairs a -> b bought together in at least min_orders orders, with support, confidence and lift"""
+    item_orders = counts.diagonal().astype(np.float64)
+    pairs = counts.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_orders)
+    a, b, together = pairs.row[keep], pairs.col[keep], pairs.data[keep]
+
+    confidence = together / item_orders[a]
+    return pd.DataFrame({
+        'a': a,
+        'b': b,
+        'orders': together,
+        'support': together / n_orders,
+        'confidence': confidence,
+        'lift': confidence / (item_orders[b] / n_orders)
+    })
+
+
+def build_basket(lines, item_key, label_key, k=TOP_PAIRS, min_orders=MIN_PAIR_ORDERS):
+    """Top-k partners per item and the strongest pairs overall for one basket level"""
+    matrix, keys, valid = incidence_matrix(lines, item_key)
+    n_orders = matrix.shape[0]
+    counts = (matrix.T @ matrix).tocsr()
+    item_orders = counts.diagonal()
+    labels = item_labels(valid, item_key, label_key, keys)
+    keys = [json_key(key) for key in keys]
+
+    pairs = pair_metrics(counts, max(n_orders, 1), min_orders)
+
+    def pair_record(row, side):
+        return {
+            'key': keys[row[side]],
+            'label': labels[row[side]],
+            'orders': int(row['orders']),
+            'support': round(float(row['support']), 4),
+            'confidence': round(float(row['confidence']), 4),
+            'lift': round(float(row['lift']), 2)
+        }
+
+    # Per item: strongest partners by lift, then by how often they co-occur
+    ranked = pairs.sort_values(['a', 'lift', 'orders'], ascending=[True, False, False])
+    ranked = ranked[ranked.groupby('a').cumcount() < k]
+    partners = {}
+    for row in ranked.to_dict('records'):
+        partners.setdefault(row['a'], []).append(pair_record(row, 'b'))
+
+    items = [{
+        'key': keys[a],
+        'label': labels[a],
+        'orders': int(item_orders[a]),
+        'pairs': partners[a]
+    } for a in sorted(partners, key=lambda a: -item_orders[a])]
+
+    # Overall: most frequent unordered pairs
+    overall = pairs[pairs['a'] < pairs['b']].sort_values(['orders', 'lift'], ascending=False).head(TOP_OVERALL)
+    top_pairs = [dict(pair_record(row, 'b'), **{'a_key': keys[row['a']], 'a_label': labels[row['a']]})
+                 for row in overall.to_dict('records')]
+
+    return {
+        'orders': int(n_orders),
+        'items': items,
+        'top_pairs': top_pairs
+    }
+
+
+def build_market_basket(lines, k=TOP_PAIRS, min_orders=MIN_PAIR_ORDERS):
+    """Basket results for every level in BASKET_LEVELS"""
+    return {level: build_basket(lines, item_key, label_key, k, min_orders)
+            for level, (item_key, label_key) in BASKET_LEVELS.items()
+            if item_key in lines.columns}
+
+
+def save_market_basket(basket, path=BASKET_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(basket, f, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    basket = build_market_basket(lines)
+    save_market_basket(basket)
+
+    for level, result in basket.items():
+        print(f"{level}: {result['orders']:,} orders, {len(result['items']):,} items with partners")
+        for pair in result['top_pairs'][:5]:
+            print(f"  {pair['a_label']} + {pair['label']}: {pair['orders']} orders, lift {pair['lift']}")
+    print(f"✅ Market basket saved to {BASKET_FILE}")
@@ -5,6 +5,19 @@ from datetime import datetime, timedelta
 import locale
 import calendar
 
+from sketches import HyperLogLog
+
+# Distinct customers/orders/products per area, city, product, brand and category:
+# 'hll' keeps a fixed-size HyperLogLog sketch per group (exact up to
+# 2**HLL_PRECISION / 8 values, ~1.6% error beyond), 'exact' keeps Python sets
+DISTINCT_COUNTS = 'hll'
+HLL_PRECISION = 12
+
+
+def distinct_set():
+    """Empty distinct-value collector for the configured DISTINCT_COUNTS mode"""
+    return HyperLogLog(HLL_PRECISION) if DISTINCT_COUNTS == 'hll' else set()
+
 # Set Arabic locale for proper date formatting
 try:
     locale.setlocale(locale.LC_ALL, 'ar_EG.UTF-8')
@@ -139,11 +152,11 @@ total_quantity = sum(float(row.get('amount', 0) or 0) for row in data)
 
 # Build direct reference structures
 customers = {}  # phone -> customer info
-areas = defaultdict(lambda: {'customers': set(), 'revenue': 0, 'quantity': 0, 'orders': set()})
-cities = defaultdict(lambda: {'areas': set(), 'customers': set(), 'revenue': 0, 'quantity': 0, 'orders': set()})
-products = defaultdict(lambda: {'customers': set(), 'revenue': 0, 'quantity': 0, 'orders': set(), 'details': []})
-brands = defaultdict(lambda: {'products': set(), 'customers': set(), 'revenue': 0, 'quantity': 0})
-categories = defaultdict(lambda: {'products': set(), 'customers': set(), 'revenue': 0, 'quantity': 0})
+areas = defaultdict(lambda: {'customers': distinct_set(), 'revenue': 0, 'quantity': 0, 'orders': distinct_set()})
+cities = defaultdict(lambda: {'areas': distinct_set(), 'customers': distinct_set(), 'revenue': 0, 'quantity': 0, 'orders': distinct_set()})
+products = defaultdict(lambda: {'customers': distinct_set(), 'revenue': 0, 'quantity': 0, 'orders': distinct_set(), 'details': []})
+brands = defaultdict(lambda: {'products': distinct_set(), 'customers': distinct_set(), 'revenue': 0, 'quantity': 0})
+categories = defaultdict(lambda: {'products': distinct_set(), 'customers': distinct_set(), 'revenue': 0, 'quantity': 0})
 
 print("Building reference structures...")
 for idx, row in enumerate(data):
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Typed order-line preparation shared by the vectorized pipeline stages
+Parses dates once and derives the GMV and month columns every stage needs
+"""
+import pandas as pd
+
+UNKNOWN = 'غير محدد'
+
+# Same formats old_py.parse_date tries, in the same order
+DATE_FORMATS = ['%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d', '%m-%d-%Y', '%d-%m-%Y']
+
+
+def parse_dates(values):
+    """Parse a date column vectorized, trying each known format on the rows still missing"""
+    values = pd.Series(values)
+    text = values.astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+
+    for fmt in DATE_FORMATS:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+
+    # Anything left (e.g. timestamps with a time part) goes through pandas inference
+    missing = parsed.isna() & values.notna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(text[missing], errors='coerce')
+
+    return parsed
+
+
+def fill_missing(values, fill=UNKNOWN):
+    """values with missing entries set to fill (added to a categorical's categories, kept in sorted order)"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and fill not in values.cat.categories:
+        values = values.cat.set_categories(sorted([*values.cat.categories, fill]))
+    return values.fillna(fill)
+
+
+def prepare_order_lines(df):
+    """Return a typed copy of the order lines with gmv, order_date and month columns"""
+    lines = df.copy()
+
+    for column in ('area', 'city', 'Type'):
+        if column in lines.columns:
+            lines[column] = fill_missing(lines[column])
+
+    lines['amount'] = pd.to_numeric(lines['amount'], errors='coerce').fillna(0)
+    lines['price_gross'] = pd.to_numeric(lines['price_gross'], errors='coerce').fillna(0)
+    lines['gmv'] = lines['amount'] * lines['price_gross']
+
+    lines['order_date'] = parse_dates(lines['date'])
+    lines['month'] = lines['order_date'].dt.strftime('%Y-%m').fillna(UNKNOWN)
+
+    return lines
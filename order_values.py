@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Order-value distributions per area, city and segment as mergeable t-digests
+Order values (GMV per order_id) come from a single grouped pass over the
+order lines that also takes each order's area, city and segment; the values
+are then split by group at every level and feed a TDigest per group, so
+percentiles for any group can be read from the payload, and sketches from
+incremental runs or partitions merge without the raw orders.
+
+Usage: python order_values.py [data.csv] [--merge]
+--merge folds the new sketches into an existing ORDER_VALUE_FILE
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from order_lines import fill_missing
+from sketches import TDigest
+
+ORDER_VALUE_FILE = 'order_value_sketches.json'
+
+# Level -> order-line column
+ORDER_VALUE_LEVELS = {
+    'area': 'area',
+    'city': 'city',
+    'segment': 'segment',
+}
+
+# Coarser than the segmentation sketches: there is one digest per group in the payload
+ORDER_VALUE_COMPRESSION = 100
+
+
+def build_order_value_sketches(lines, compression=ORDER_VALUE_COMPRESSION):
+    """{level: {group: TDigest of order values}} for every level column present in lines"""
+    # One pass: each order's value, and the line that gives the order its groups (its first)
+    order_codes, _ = pd.factorize(lines['order_id'].astype(str))
+    values = lines['gmv'].groupby(order_codes, sort=True).sum().to_numpy(dtype=np.float64)
+    _, first_lines = np.unique(order_codes, return_index=True)
+
+    sketches = {}
+    for level, column in ORDER_VALUE_LEVELS.items():
+        if column not in lines.columns:
+            continue
+        group_codes, groups = pd.factorize(fill_missing(lines[column]).astype(str), sort=True)
+        keys = group_codes[first_lines]
+        order = np.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.int64)
+        chunks = np.split(values[order], starts[1:])
+        sketches[level] = {str(groups[keys[start]]): TDigest(compression).update(chunk)
+                           for start, chunk in zip(starts, chunks)}
+    return sketches
+
+
+def customer_segments(lines):
+    """
+    {customer name: segment name}, from the metrics the comprehensive generator segments on
+
+    Customers (by name) get GMV, distinct order and purchase-day counts, RFM
+    and churn metrics, then segmentation.classify_customers with the metric
+    sketches, as in the generator. Only for runs without its mapping.
+    """
+    from churn import build_churn, churn_records
+    from rfm import build_rfm, rfm_records
+    from segmentation import build_metric_sketches, classify_customers, customer_metrics
+
+    keyed = pd.DataFrame({
+        'name': lines['name'].astype(str).to_numpy(),
+        'gmv': lines['gmv'].to_numpy(),
+        'order': lines['order_id'].astype(str).to_numpy(),
+        'day': lines['date'].astype(str).to_numpy()
+    })
+    totals = keyed.groupby('name', sort=False).agg(
+        total_gmv=('gmv', 'sum'),
+        unique_orders=('order', 'nunique'),
+        unique_dates=('day', 'nunique')
+    )
+    totals['avg_order_value'] = (totals['total_gmv'] / totals['unique_orders']).round(2)
+    totals['total_gmv'] = totals['total_gmv'].round(2)
+    rfm_by_name = rfm_records(build_rfm(lines))
+    churn_by_name = churn_records(build_churn(lines))
+
+    customers = []
+    for name, total_gmv, unique_orders, unique_dates, avg_order_value in totals.itertuples(name=None):
+        customer = {'name': name, 'total_gmv': total_gmv, 'unique_orders': unique_orders,
+                    'unique_dates': unique_dates, 'avg_order_value': avg_order_value}
+        customer.update(rfm_by_name.get(name, {}))
+        customer.update(churn_by_name.get(name, {}))
+        customers.append(customer)
+
+    sketches = build_metric_sketches(customer_metrics(customers))
+    return {c['name']: seg['name'] for c, seg in zip(customers, classify_customers(customers, sketches=sketches))}
+
+
+def segment_lines(lines, segment_by_name=None):
+    """
+    Segment name per order line (UNKNOWN for customers without one)
+
+    segment_by_name is the generator's {customer name: segment}, so the
+    sketches and the dashboard segments agree; customer_segments() rebuilds
+    it from the lines when a run has none.
+    """
+    if segment_by_name is None:
+        segment_by_name = customer_segments(lines)
+    return fill_missing(lines['name'].map(segment_by_name))
+
+
+def merge_order_value_sketches(sketches, other):
+    """Merge sketches from another run or partition (holding whole orders) into `sketches`"""
+    for level, groups in other.items():
+        target = sketches.setdefault(level, {})
+        for group, digest in groups.items():
+            if group in target:
+                target[group].merge(digest)
+            else:
+                target[group] = digest
+    return sketches
+
+
+def order_value_percentiles(digest, quantiles=(0.5, 0.9)):
+    """{'count', 'p50', 'p90', ...} for one digest"""
+    summary = {'count': int(digest.count)}
+    for q in quantiles:
+        summary[f"p{round(q * 100)}"] = round(digest.quantile(q), 2)
+    return summary
+
+
+def sketches_to_dict(sketches, decimals=2):
+    return {level: {group: digest.to_dict(decimals) for group, digest in groups.items()}
+            for level, groups in sketches.items()}
+
+
+def sketches_from_dict(data):
+    return {level: {group: TDigest.from_dict(digest) for group, digest in groups.items()}
+            for level, groups in data.items()}
+
+
+def save_order_value_sketches(sketches, path=ORDER_VALUE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sketches_to_dict(sketches), f, ensure_ascii=False)
+
+
+def load_order_value_sketches(path=ORDER_VALUE_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return sketches_from_dict(json.load(f))
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    args = [arg for arg in sys.argv[1:] if arg != '--merge']
+    source = args[0] if args else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    lines['segment'] = segment_lines(lines)
+    sketches = build_order_value_sketches(lines)
+    if '--merge' in sys.argv and os.path.exists(ORDER_VALUE_FILE):
+        sketches = merge_order_value_sketches(load_order_value_sketches(ORDER_VALUE_FILE), sketches)
+        print(f"Merged into the existing {ORDER_VALUE_FILE}")
+    save_order_value_sketches(sketches)
+
+    for level, groups in sketches.items():
+        print(f"{level}: {len(groups):,} groups")
+        for group, digest in list(groups.items())[:5]:
+            summary = order_value_percentiles(digest)
+            print(f"  {group}: {summary['count']:,} orders, median {summary['p50']:,.2f}, p90 {summary['p90']:,.2f}")
+    print(f"✅ Order-value sketches saved to {ORDER_VALUE_FILE}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Order-level fact table
+One row per order_id with its customer, date, line count, quantity, GMV and
+distinct brands and products, built with a single grouped pass over the
+typed order lines and stored as Parquet so later analyses read orders
+instead of rebuilding them from line items.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from order_lines import fill_missing
+
+ORDERS_FILE = 'orders.parquet'
+
+# Customer attributes taken from the order's first line
+ORDER_ATTRIBUTES = ('name', 'phone', 'area', 'city', 'Type')
+
+
+def customer_ids(lines):
+    """'name_phone' keys, the same customer key customer_state.py uses"""
+    name = lines['name'].where(lines['name'].notna(), 'Unknown').astype(str).str.strip()
+    phone = pd.to_numeric(lines['phone'], errors='coerce').fillna(0).astype('int64')
+    return name + '_' + phone.astype(str)
+
+
+def build_orders(lines):
+    """DataFrame with one typed row per order, from prepared order lines"""
+    typed = pd.DataFrame({
+        'order_id': lines['order_id'].astype(str).to_numpy(),
+        'customer_id': customer_ids(lines).to_numpy(),
+        'order_date': lines['order_date'].to_numpy(),
+        'amount': lines['amount'].to_numpy(dtype=np.float64),
+        'gmv': lines['gmv'].to_numpy(dtype=np.float64),
+        'brand': lines['brand'].to_numpy() if 'brand' in lines.columns else None,
+        'base_id': lines['base_id'].to_numpy() if 'base_id' in lines.columns else None
+    })
+    for column in ORDER_ATTRIBUTES:
+        if column in lines.columns:
+            typed[column] = lines[column].to_numpy()
+
+    grouped = typed.groupby('order_id', sort=False)
+    orders = grouped.agg(
+        order_date=('order_date', 'min'),
+        line_count=('gmv', 'size'),
+        quantity=('amount', 'sum'),
+        gmv=('gmv', 'sum'),
+        distinct_brands=('brand', 'nunique'),
+        distinct_products=('base_id', 'nunique')
+    )
+    firsts = typed.drop_duplicates('order_id').set_index('order_id')
+    attributes = ['customer_id'] + [c for c in ORDER_ATTRIBUTES if c in typed.columns]
+    orders = firsts[attributes].join(orders).reset_index()
+
+    orders['phone'] = pd.to_numeric(orders['phone'], errors='coerce').fillna(0).astype('int64')
+    for column in ('area', 'city', 'Type'):
+        if column in orders.columns:
+            orders[column] = fill_missing(orders[column]).astype(str).astype('category')
+    for column in ('line_count', 'distinct_brands', 'distinct_products'):
+        orders[column] = orders[column].astype('int32')
+    orders['gmv'] = orders['gmv'].round(2)
+    return orders.sort_values(['order_date', 'order_id'], kind='mergesort').reset_index(drop=True)
+
+
+def save_orders(orders, path=ORDERS_FILE):
+    orders.to_parquet(path, index=False)
+
+
+def load_orders(path=ORDERS_FILE, columns=None):
+    return pd.read_parquet(path, columns=columns)
+
+
+def order_metrics(orders):
+    """Average order value and basket-size distribution from the fact table"""
+    basket = orders['line_count']
+    return {
+        'orders': len(orders),
+        'customers': int(orders['customer_id'].nunique()),
+        'aov': round(float(orders['gmv'].mean()), 2) if len(orders) else 0.0,
+        'median_order_value': round(float(orders['gmv'].median()), 2) if len(orders) else 0.0,
+        'avg_lines': round(float(basket.mean()), 2) if len(orders) else 0.0,
+        'avg_brands': round(float(orders['distinct_brands'].mean()), 2) if len(orders) else 0.0,
+        'basket_sizes': {int(size): int(count) for size, count in basket.value_counts().sort_index().items()}
+    }
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    orders = build_orders(prepare_order_lines(load_table(source, sep='\t', encoding='utf-8')))
+    save_orders(orders)
+
+    metrics = order_metrics(orders)
+    print(f"Orders: {metrics['orders']:,} from {metrics['customers']:,} customers")
+    print(f"AOV: {metrics['aov']:,.2f} EGP, median {metrics['median_order_value']:,.2f} EGP")
+    print(f"Lines per order: {metrics['avg_lines']}, brands per order: {metrics['avg_brands']}")
+    print(f"✅ Orders saved to {ORDERS_FILE}")
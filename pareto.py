@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ABC / Pareto classification of customers, products, brands and areas by GMV
+One grouped sum per level, then a descending sort and cumulative sum: items
+making up the first 80% of GMV are class A, the next 15% class B and the
+rest class C. Each level also keeps a 101-point Pareto curve (share of GMV
+held by the top 0..100% of items) for charting.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+ABC_FILE = 'abc_classes.csv'
+
+# (class, cumulative GMV share it ends at)
+ABC_CLASSES = (
+    ('A', 0.80),
+    ('B', 0.95),
+    ('C', 1.00),
+)
+
+# Level -> order-line column
+ABC_LEVELS = {
+    'customers': 'name',
+    'products': 'product',
+    'brands': 'brand',
+    'areas': 'area',
+}
+
+CURVE_POINTS = 101
+
+
+def abc_classify(gmv):
+    """Series of GMV per item -> DataFrame sorted by GMV with cumulative share and class"""
+    ranked = gmv.sort_values(ascending=False, kind='mergesort')
+    values = ranked.to_numpy(dtype=np.float64)
+    total = values.sum()
+    cum_share = np.cumsum(values) / total if total > 0 else np.ones(len(values))
+
+    # An item's class is decided by the share held by the items ranked above it
+    share_before = cum_share - (values / total if total > 0 else 0)
+    limits = np.array([limit for _, limit in ABC_CLASSES])
+    labels = np.array([label for label, _ in ABC_CLASSES])
+    classes = labels[np.minimum(np.searchsorted(limits, share_before, side='right'), len(labels) - 1)]
+
+    return pd.DataFrame({'gmv': values, 'cum_share': cum_share, 'abc_class': classes}, index=ranked.index)
+
+
+def pareto_curve(cum_share, points=CURVE_POINTS):
+    """Share of GMV held by the top 0%, 1%, ..., 100% of items"""
+    n = len(cum_share)
+    if n == 0:
+        return [0.0] * points
+    population = np.arange(n + 1) / n
+    return np.round(np.interp(np.linspace(0, 1, points), population, np.r_[0.0, cum_share]), 4).tolist()
+
+
+def build_abc(lines):
+    """(per-level summaries for the dashboard, {level: classified DataFrame})"""
+    summaries, tables = {}, {}
+    for level, column in ABC_LEVELS.items():
+        if column not in lines.columns:
+            continue
+        table = abc_classify(lines.groupby(column, observed=True)['gmv'].sum())
+        tables[level] = table
+
+        total = table['gmv'].sum()
+        by_class = table.groupby('abc_class')['gmv'].agg(['size', 'sum'])
+        curve = pareto_curve(table['cum_share'].to_numpy())
+        summaries[level] = {
+            'items': len(table),
+            'counts': {label: int(by_class['size'].get(label, 0)) for label, _ in ABC_CLASSES},
+            'gmv_share': {label: round(float(by_class['sum'].get(label, 0.0)) / total, 4) if total else 0.0
+                          for label, _ in ABC_CLASSES},
+            'top_20_share': curve[round((CURVE_POINTS - 1) * 0.2)],
+            'curve': curve
+        }
+    return summaries, tables
+
+
+def abc_frame(tables):
+    """Long-format table of every classified item"""
+    frames = [table.rename_axis('key').reset_index().assign(level=level) for level, table in tables.items()]
+    if not frames:
+        return pd.DataFrame(columns=['level', 'key', 'gmv', 'cum_share', 'abc_class'])
+    return pd.concat(frames, ignore_index=True)[['level', 'key', 'gmv', 'cum_share', 'abc_class']]
+
+
+def save_abc_csv(tables, path=ABC_FILE):
+    abc_frame(tables).to_csv(path, index=False, encoding='utf-8')
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    summaries, tables = build_abc(lines)
+    save_abc_csv(tables)
+
+    for level, summary in summaries.items():
+        counts = ', '.join(f"{label}: {count:,}" for label, count in summary['counts'].items())
+        print(f"{level}: {summary['items']:,} items ({counts}), top 20% hold {summary['top_20_share']:.1%} of GMV")
+    print(f"✅ ABC classes saved to {ABC_FILE}")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Month- and city-partitioned Parquet storage for order lines
+write_partitions() stores the prepared order lines under PARTITION_DIR in
+Hive-style directories (month=2024-01/city=<city>/part-0.parquet), plus a
+_stats.json with each partition's row count and the min/max of its dates
+and amounts. load_partitions() takes date and city filters, picks the
+partitions whose keys and stats can match from _stats.json alone, and reads
+only those files, so "last month in Cairo" no longer reads the full
+history.
+
+Each write goes to a new version directory (PARTITION_DIR/v<ns>/) and then
+the CURRENT pointer file is replaced atomically, so readers always find a
+complete store. The previous version is kept for readers still using it;
+older versions and abandoned partial writes are removed.
+
+Usage: python partitions.py [data_cleaned.csv]
+       python partitions.py --from 2025-06-01 [--to 2025-06-30] [--city CITY ...]
+"""
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+from order_lines import fill_missing
+
+PARTITION_DIR = 'order_lines_partitioned'
+STATS_FILE = '_stats.json'
+CURRENT_FILE = 'CURRENT'
+
+# Bump when the stored layout changes so stores stamped by older code are rewritten
+PARTITION_VERSION = 1
+PARTITION_KEYS = ('month', 'city')
+
+# Seconds after which a partial write (v<ns>.tmp) is taken as abandoned
+STALE_WRITE_AGE = 6 * 60 * 60
+
+# Columns whose min/max are recorded per partition
+STAT_COLUMNS = ('order_date', 'amount', 'price_gross', 'gmv')
+
+# Characters escaped in directory names (Hive-style %XX)
+UNSAFE_CHARACTERS = '%/\\:*?"<>|='
+
+
+def escape_value(value):
+    """Partition value as a directory-safe name"""
+    return ''.join(f'%{ord(c):02X}' if c in UNSAFE_CHARACTERS or ord(c) < 32 else c for c in str(value))
+
+
+def partition_path(month, city):
+    """Relative path of a partition's directory"""
+    return os.path.join(f"month={escape_value(month)}", f"city={escape_value(city)}")
+
+
+def _stat_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    return float(value)
+
+
+def partition_stats(lines):
+    """{relative path: {'month', 'city', 'rows', column: [min, max]}} per partition"""
+    columns = [c for c in STAT_COLUMNS if c in lines.columns]
+    grouped = lines.groupby(list(PARTITION_KEYS), observed=True, sort=True)
+    mins = grouped[columns].min()
+    maxs = grouped[columns].max()
+    sizes = grouped.size()
+
+    stats = {}
+    for (month, city), rows in sizes.items():
+        entry = {'month': str(month), 'city': str(city), 'rows': int(rows)}
+        for column in columns:
+            entry[column] = [_stat_value(mins.at[(month, city), column]), _stat_value(maxs.at[(month, city), column])]
+        stats[partition_path(month, city)] = entry
+    return stats
+
+
+def source_stamp(source, key=None):
+    """What a store was built from: layout version, source file size and mtime, and a caller key"""
+    stat = os.stat(source)
+    return {'version': PARTITION_VERSION, 'source': os.path.abspath(source), 'size': stat.st_size,
+            'mtime': stat.st_mtime_ns, 'key': key}
+
+
+def current_version(root=PARTITION_DIR):
+    """Directory of the version CURRENT points to"""
+    with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+        return os.path.join(root, f.read().strip())
+
+
+def write_partitions(lines, root=PARTITION_DIR, source=None, key=None):
+    """
+    Write prepared order lines (order_lines.prepare_order_lines) as a new version of the store
+
+    The version is written in full, then CURRENT is swapped to it, so readers
+    see either the old store or the new one. Versions older than the one
+    replaced are removed (remove_stale). source (and key, e.g. a price policy) stamp the
+    store for is_current(). Returns the partition stats.
+    """
+    lines = lines.copy()
+    lines['city'] = fill_missing(lines['city'])
+
+    os.makedirs(root, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    partial = os.path.join(root, version + '.tmp')
+
+    stats = partition_stats(lines)
+    data_columns = [c for c in lines.columns if c not in PARTITION_KEYS]
+    for (month, city), part in lines.groupby(list(PARTITION_KEYS), observed=True, sort=False):
+        directory = os.path.join(partial, partition_path(month, city))
+        os.makedirs(directory, exist_ok=True)
+        part[data_columns].to_parquet(os.path.join(directory, 'part-0.parquet'), index=False)
+
+    stamp = source_stamp(source, key) if source is not None else None
+    with open(os.path.join(partial, STATS_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'columns': list(lines.columns), 'stamp': stamp, 'partitions': stats},
+                  f, ensure_ascii=False, indent=2)
+    os.replace(partial, os.path.join(root, version))
+
+    previous = os.path.basename(current_version(root)) if os.path.exists(os.path.join(root, CURRENT_FILE)) else None
+    pointer = os.path.join(root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+    remove_stale(root, keep=(version, previous))
+    return stats
+
+
+def _version_time(name):
+    """Write time (ns) of a version directory name (v<ns>), None for other names"""
+    return int(name[1:]) if name.startswith('v') and name[1:].isdigit() else None
+
+
+def remove_stale(root=PARTITION_DIR, keep=(), max_age=STALE_WRITE_AGE):
+    """
+    Remove versions older than the ones kept and abandoned partial writes
+
+    Only complete versions older than every kept version are removed, so a
+    concurrent writer's newer version survives. Partial (.tmp) directories and
+    pointer files are removed once they are max_age seconds old, which
+    leaves writes in progress alone. The pre-versioning flat layout goes too.
+    """
+    oldest_kept = min((_version_time(name) for name in keep if name and _version_time(name) is not None),
+                      default=None)
+    now = time.time()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        written = _version_time(name)
+        if written is not None:
+            if oldest_kept is not None and written < oldest_kept and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        elif name.endswith('.tmp'):
+            try:
+                if now - os.path.getmtime(path) <= max_age:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # finished or cleaned up by another writer meanwhile
+        elif name.startswith(f'{PARTITION_KEYS[0]}=') and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name == STATS_FILE:
+            os.remove(path)
+
+
+def load_stats(root=PARTITION_DIR):
+    """Stats of the current version, with its directory under 'path'"""
+    path = current_version(root)
+    with open(os.path.join(path, STATS_FILE), 'r', encoding='utf-8') as f:
+        stats = json.load(f)
+    stats['path'] = path
+    return stats
+
+
+def is_current(root, source, key=None):
+    """True when the store was written from source (unchanged since) with the same key"""
+    try:
+        stamp = load_stats(root).get('stamp')
+    except (OSError, ValueError):
+        return False
+    return stamp is not None and os.path.exists(source) and stamp == source_stamp(source, key)
+
+
+def _day(value):
+    return None if value is None else pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def select_partitions(stats, start=None, end=None, cities=None):
+    """
+    Relative paths of the partitions that can hold lines in [start, end] for cities
+
+    Months and cities prune on the partition keys; the recorded order_date
+    min/max then drop partitions that only overlap the range by month.
+    Partitions without a parsed date are kept only when no date filter is set.
+    """
+    start, end = _day(start), _day(end)
+    cities = None if cities is None else {str(city) for city in cities}
+
+    selected = []
+    for path, entry in stats['partitions'].items():
+        if cities is not None and entry['city'] not in cities:
+            continue
+        if start is not None or end is not None:
+            low, high = entry.get('order_date') or [None, None]
+            if low is None:
+                continue
+            if start is not None and (high < start or entry['month'] < start[:7]):
+                continue
+            if end is not None and (low > end or entry['month'] > end[:7]):
+                continue
+        selected.append(path)
+    return selected
+
+
+def load_partitions(root=PARTITION_DIR, start=None, end=None, cities=None, columns=None):
+    """
+    Order lines from the partitions matching a date range and cities
+
+    start and end are inclusive dates (anything pd.Timestamp accepts), cities
+    an iterable of city names; None means no filter. Only the selected
+    partition files are read, then rows outside [start, end] are dropped.
+    The month and city keys come back as categorical columns.
+    """
+    stats = load_stats(root)
+    paths = select_partitions(stats, start, end, cities)
+    wanted = stats['columns'] if columns is None else list(columns)
+    data_columns = [c for c in wanted if c not in PARTITION_KEYS]
+    read_columns = data_columns + (['order_date'] if (start or end) and 'order_date' not in data_columns else [])
+
+    frames = []
+    for path in paths:
+        part = pd.read_parquet(os.path.join(stats['path'], path, 'part-0.parquet'), columns=read_columns)
+        entry = stats['partitions'][path]
+        if start is not None:
+            part = part[part['order_date'] >= pd.Timestamp(start)]
+        if end is not None:
+            part = part[part['order_date'] <= pd.Timestamp(end)]
+        for key in PARTITION_KEYS:
+            part[key] = entry[key]
+        frames.append(part)
+
+    if not frames:
+        return pd.DataFrame(columns=wanted)
+
+    lines = pd.concat(frames, ignore_index=True)
+    # Each file restores its own categories; concat falls back to text where they differ
+    for column in lines.columns:
+        if column in PARTITION_KEYS or isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            lines[column] = lines[column].astype('category')
+    return lines[wanted]
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0].startswith('--'):
+        options = {'--from': None, '--to': None}
+        cities = []
+        flag = None
+        for arg in args:
+            if arg in ('--from', '--to', '--city'):
+                flag = arg
+            elif flag == '--city':
+                cities.append(arg)
+            elif flag:
+                options[flag] = arg
+        stats = load_stats(PARTITION_DIR)
+        selected = select_partitions(stats, options['--from'], options['--to'], cities or None)
+        lines = load_partitions(PARTITION_DIR, options['--from'], options['--to'], cities or None)
+        print(f"Read {len(selected):,} of {len(stats['partitions']):,} partitions")
+        print(f"Lines: {len(lines):,}, GMV: {lines['gmv'].sum() if len(lines) else 0:,.2f} EGP")
+        sys.exit(0)
+
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = args[0] if args else 'data_cleaned.csv'
+    print(f"Loading {source}...")
+    stats = write_partitions(prepare_order_lines(load_table(source, sep='\t', encoding='utf-8')), source=source)
+    months = {entry['month'] for entry in stats.values()}
+    cities = {entry['city'] for entry in stats.values()}
+    print(f"Partitions: {len(stats):,} ({len(months)} months × {len(cities)} cities)")
+    print(f"✅ Order lines saved to {PARTITION_DIR}/")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Robust price-anomaly detection per base_id
+One grouped pass gives each base_id's median price and median absolute
+deviation (MAD); lines whose robust z-score 0.6745 * (price - median) / MAD
+is beyond ANOMALY_Z are flagged. A policy then keeps, drops or caps them
+before GMV is computed.
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+ANOMALY_FILE = 'price_anomalies.csv'
+
+# Iglewicz-Hoaglin cutoff for the modified z-score
+ANOMALY_Z = 3.5
+
+# base_ids need this many priced lines before their median is trusted
+MIN_LINES = 5
+
+# MAD floor as a share of the median, so a base_id with one fixed price does not flag every discount
+MIN_RELATIVE_MAD = 0.01
+
+PRICE_POLICIES = ('flag', 'exclude', 'cap')
+
+
+def detect_price_anomalies(df, item_key='base_id'):
+    """Per-line price_median, price_mad, price_z and price_anomaly, aligned to df"""
+    price = pd.to_numeric(df['price_gross'], errors='coerce')
+    item = df[item_key]
+    priced = price.notna() & item.notna()
+
+    groups = price[priced].groupby(item[priced])
+    median = groups.transform('median')
+    mad = (price[priced] - median).abs().groupby(item[priced]).transform('median')
+    count = groups.transform('size')
+
+    scale = np.maximum(mad, MIN_RELATIVE_MAD * median.abs())
+    z = 0.6745 * (price[priced] - median) / scale.where(scale > 0)
+    z = z.where(count >= MIN_LINES)
+
+    result = pd.DataFrame({
+        'price_median': median,
+        'price_mad': mad,
+        'price_z': z
+    }).reindex(df.index)
+    result['price_anomaly'] = result['price_z'].abs() > ANOMALY_Z
+    return result
+
+
+def apply_price_policy(df, anomalies, policy='flag'):
+    """
+    Order lines with the policy applied to flagged prices
+
+    'flag' leaves the lines unchanged, 'exclude' drops flagged lines, and
+    'cap' clips their price to median ± ANOMALY_Z robust deviations.
+    """
+    if policy not in PRICE_POLICIES:
+        raise ValueError(f"Unknown price policy: {policy}")
+    flagged = anomalies['price_anomaly']
+    if policy == 'flag' or not flagged.any():
+        return df
+    if policy == 'exclude':
+        return df[~flagged]
+
+    capped = df.copy()
+    scale = np.maximum(anomalies['price_mad'], MIN_RELATIVE_MAD * anomalies['price_median'].abs())
+    limit = ANOMALY_Z * scale / 0.6745
+    price = pd.to_numeric(capped['price_gross'], errors='coerce')
+    capped.loc[flagged, 'price_gross'] = price[flagged].clip(
+        anomalies['price_median'][flagged] - limit[flagged],
+        anomalies['price_median'][flagged] + limit[flagged]
+    )
+    return capped
+
+
+def anomaly_report(df, anomalies, limit=500):
+    """Flagged lines, largest GMV impact (vs. the median price) first"""
+    flagged = anomalies['price_anomaly']
+    columns = [c for c in ('order_id', 'date', 'name', 'area', 'base_id', 'product', 'amount', 'price_gross')
+               if c in df.columns]
+    report = df.loc[flagged, columns].copy()
+    report['price_median'] = anomalies.loc[flagged, 'price_median']
+    report['price_z'] = anomalies.loc[flagged, 'price_z'].round(2)
+    amount = pd.to_numeric(report['amount'], errors='coerce').fillna(0)
+    price = pd.to_numeric(report['price_gross'], errors='coerce')
+    report['gmv_impact'] = (amount * (price - report['price_median'])).round(2)
+    return report.reindex(report['gmv_impact'].abs().sort_values(ascending=False).index).head(limit)
+
+
+if __name__ == '__main__':
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    df = load_table(source, sep='\t', encoding='utf-8')
+    anomalies = detect_price_anomalies(df)
+    report = anomaly_report(df, anomalies)
+    report.to_csv(ANOMALY_FILE, index=False, encoding='utf-8')
+
+    print(f"Lines checked: {anomalies['price_z'].notna().sum():,}, flagged: {anomalies['price_anomaly'].sum():,}")
+    print(f"GMV impact of the worst {len(report):,}: {report['gmv_impact'].sum():,.2f}")
+    print(f"✅ Price anomalies saved to {ANOMALY_FILE}")
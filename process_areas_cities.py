@@ -3,12 +3,12 @@
 """
 Process customers data to extract and consolidate cities and areas
 """
-import pandas as pd
 import json
-from collections import defaultdict
 
-# Read the cleaned data
-df = pd.read_csv('data_cleaned.csv')
+from schema import load_table
+
+# Read the cleaned data (only the columns the mapping uses)
+df = load_table('data_cleaned.csv', sep='\t', encoding='utf-8', usecols=['name', 'area', 'city'])
 
 # Create city and area mapping for consolidation
 CITY_MAPPING = {
@@ -66,29 +66,14 @@ valid_areas = [a for a in areas if a and a != 'غير محدد']
 print(f"\nValid cities (without 'غير محدد'): {len(valid_cities)}")
 print(f"Valid areas (without 'غير محدد'): {len(valid_areas)}")
 
-# Group customers by city and area
-customers_by_city = defaultdict(list)
-customers_by_area = defaultdict(list)
-customers_by_city_area = defaultdict(lambda: defaultdict(list))
-
-for idx, row in df.iterrows():
-    customer_name = row['name']
-    if customer_name not in ['Location'] and pd.notna(customer_name):
-        city = row['city'] if pd.notna(row['city']) and row['city'] != 'غير محدد' else None
-        area = row['area'] if pd.notna(row['area']) and row['area'] != 'غير محدد' else None
-        
-        if city:
-            customers_by_city[city].append(customer_name)
-        if area:
-            customers_by_area[area].append(customer_name)
-        if city and area:
-            customers_by_city_area[city][area].append(customer_name)
-
-# Remove duplicates
-for key in customers_by_city:
-    customers_by_city[key] = list(set(customers_by_city[key]))
-for key in customers_by_area:
-    customers_by_area[key] = list(set(customers_by_area[key]))
+# Distinct customers per city and per area (named customers, known locations only)
+named = df[df['name'].notna() & (df['name'] != 'Location')]
+customers_by_city = {}
+customers_by_area = {}
+for column, counts in (('city', customers_by_city), ('area', customers_by_area)):
+    located = named[named[column].notna() & (named[column] != 'غير محدد')]
+    for value, customers in located.groupby(column, observed=True, sort=False)['name'].nunique().items():
+        counts[value] = int(customers)
 
 print(f"\nCustomers by city: {len(customers_by_city)}")
 print(f"Customers by area: {len(customers_by_area)}")
@@ -98,8 +83,8 @@ with open('city_area_mapping.json', 'w', encoding='utf-8') as f:
     json.dump({
         'city_mapping': CITY_MAPPING,
         'area_mapping': AREA_MAPPING,
-        'cities': {city: len(customers) for city, customers in customers_by_city.items()},
-        'areas': {area: len(customers) for area, customers in customers_by_area.items()},
+        'cities': customers_by_city,
+        'areas': customers_by_area,
     }, f, ensure_ascii=False, indent=2)
 
 print("\n✅ Mapping file created: city_area_mapping.json")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RFM (recency, frequency, monetary) scoring over the order history
+One grouped pass gives each customer's last order date, distinct orders and
+GMV; each measure is then scored 1-5 by quintile (5 = most recent / most
+frequent / highest spend)
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+RFM_FILE = 'customer_rfm.csv'
+RFM_BINS = 5
+
+
+def quantile_scores(values, ascending=True, bins=RFM_BINS):
+    """Score 1..bins by percentile rank; missing values get the lowest score"""
+    pct = values.rank(pct=True, method='average', ascending=ascending)
+    return np.ceil(pct * bins).clip(1, bins).fillna(1).astype(int)
+
+
+def build_rfm(lines, customer_key='name', reference_date=None):
+    """DataFrame indexed by customer with last_order_date, recency_days, frequency, monetary and scores"""
+    rfm = lines.groupby(customer_key).agg(
+        last_order_date=('order_date', 'max'),
+        frequency=('order_id', 'nunique'),
+        monetary=('gmv', 'sum')
+    )
+
+    if reference_date is None:
+        reference_date = lines['order_date'].max()
+    rfm['recency_days'] = (pd.Timestamp(reference_date) - rfm['last_order_date']).dt.days
+
+    # Fewer days since the last order is better, so recency ranks descending
+    rfm['r_score'] = quantile_scores(rfm['recency_days'], ascending=False)
+    rfm['f_score'] = quantile_scores(rfm['frequency'])
+    rfm['m_score'] = quantile_scores(rfm['monetary'])
+    rfm['rfm_score'] = (rfm['r_score'].astype(str) + rfm['f_score'].astype(str) + rfm['m_score'].astype(str))
+    return rfm
+
+
+def rfm_records(rfm):
+    """{customer: payload fields} ready to merge into the dashboard customer objects"""
+    payload = pd.DataFrame({
+        'last_order_date': rfm['last_order_date'].dt.strftime('%Y-%m-%d'),
+        'recency_days': rfm['recency_days'].astype('Int64'),
+        'r_score': rfm['r_score'],
+        'f_score': rfm['f_score'],
+        'm_score': rfm['m_score'],
+        'rfm_score': rfm['rfm_score']
+    }, index=rfm.index).astype(object)
+    payload = payload.where(payload.notna(), None)
+    return payload.to_dict('index')
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    rfm = build_rfm(lines)
+    rfm.to_csv(RFM_FILE, encoding='utf-8')
+
+    print(f"Customers scored: {len(rfm):,}")
+    print(rfm.groupby('r_score')['recency_days'].agg(['count', 'min', 'max']))
+    print(f"✅ RFM scores saved to {RFM_FILE}")
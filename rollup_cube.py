@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Precomputed rollup cube over city × area × Type × segment × month
+Stores GMV, line count, distinct orders and distinct customers for every
+combination of dimensions (subtotals included) in a compact .npz file,
+so reports can answer from the cube instead of rescanning the order lines
+"""
+from itertools import combinations
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+CUBE_FILE = 'rollup_cube.npz'
+CUBE_DIMENSIONS = ('city', 'area', 'Type', 'segment', 'month')
+CUBE_MEASURES = ('gmv', 'lines', 'orders', 'customers')
+
+# Dimension code meaning "all values" (subtotal)
+ALL = -1
+
+
+def build_cube(lines, dimensions=CUBE_DIMENSIONS, customer_key='name'):
+    """Aggregate prepared order lines into every grouping set of `dimensions`"""
+    dimensions = tuple(dimensions)
+    labels = {}
+    frame = pd.DataFrame(index=lines.index)
+
+    for dim in dimensions:
+        codes, uniques = pd.factorize(lines[dim].astype(str), sort=True)
+        frame[dim] = codes
+        labels[dim] = np.asarray(uniques, dtype=str)
+
+    frame['gmv'] = lines['gmv'].to_numpy(dtype=np.float64)
+    frame['order'] = pd.factorize(lines['order_id'].astype(str))[0]
+    frame['customer'] = pd.factorize(lines[customer_key].astype(str))[0]
+
+    parts = []
+    for size in range(len(dimensions) + 1):
+        for subset in combinations(dimensions, size):
+            if subset:
+                cells = frame.groupby(list(subset), sort=False).agg(
+                    gmv=('gmv', 'sum'),
+                    lines=('gmv', 'size'),
+                    orders=('order', 'nunique'),
+                    customers=('customer', 'nunique')
+                ).reset_index()
+            else:
+                cells = pd.DataFrame({
+                    'gmv': [frame['gmv'].sum()],
+                    'lines': [len(frame)],
+                    'orders': [frame['order'].nunique()],
+                    'customers': [frame['customer'].nunique()]
+                })
+            for dim in dimensions:
+                if dim not in subset:
+                    cells[dim] = ALL
+            parts.append(cells[list(dimensions) + list(CUBE_MEASURES)])
+
+    cells = pd.concat(parts, ignore_index=True)
+    widest = max((len(labels[dim]) for dim in dimensions), default=0)
+    code_dtype = np.int16 if widest < np.iinfo(np.int16).max else np.int32
+
+    return {
+        'dimensions': dimensions,
+        'labels': labels,
+        'codes': cells[list(dimensions)].to_numpy(dtype=code_dtype),
+        'gmv': cells['gmv'].to_numpy(dtype=np.float64),
+        'lines': cells['lines'].to_numpy(dtype=np.int64),
+        'orders': cells['orders'].to_numpy(dtype=np.int64),
+        'customers': cells['customers'].to_numpy(dtype=np.int64)
+    }
+
+
+def source_stamp(path):
+    """(size, mtime_ns) of the file a cube is built from"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def save_cube(cube, path=CUBE_FILE, source=None):
+    """Write the cube as a compressed array file, stamped with its source file's size and mtime"""
+    arrays = {
+        'dimensions': np.asarray(cube['dimensions'], dtype=str),
+        'codes': cube['codes']
+    }
+    if source is not None:
+        arrays['source'] = np.asarray(source_stamp(source), dtype=np.int64)
+    for measure in CUBE_MEASURES:
+        arrays[measure] = cube[measure]
+    for dim in cube['dimensions']:
+        arrays['labels_' + dim] = cube['labels'][dim]
+    np.savez_compressed(path, **arrays)
+
+
+def load_cube(path=CUBE_FILE):
+    """Load a cube written by save_cube"""
+    with np.load(path) as data:
+        dimensions = tuple(str(dim) for dim in data['dimensions'])
+        cube = {
+            'dimensions': dimensions,
+            'labels': {dim: data['labels_' + dim] for dim in dimensions},
+            'codes': data['codes']
+        }
+        for measure in CUBE_MEASURES:
+            cube[measure] = data[measure]
+        cube['source'] = tuple(data['source'].tolist()) if 'source' in data.files else None
+    return cube
+
+
+def cube_is_current(cube, source):
+    """True when the cube was stamped from source and the file has not changed since"""
+    return cube.get('source') is not None and os.path.exists(source) and cube['source'] == source_stamp(source)
+
+
+def _cell_mask(cube, by, filters):
+    """Boolean mask of the cells grouped by `by` and fixed to `filters`"""
+    mask = np.ones(len(cube['gmv']), dtype=bool)
+    for position, dim in enumerate(cube['dimensions']):
+        column = cube['codes'][:, position]
+        if dim in filters:
+            matches = np.flatnonzero(cube['labels'][dim] == str(filters[dim]))
+            if len(matches) == 0:
+                return np.zeros_like(mask)
+            mask &= column == matches[0]
+        elif dim in by:
+            mask &= column != ALL
+        else:
+            mask &= column == ALL
+    return mask
+
+
+def cube_lookup(cube, **filters):
+    """Measures of a single cell, e.g. cube_lookup(cube, city='محافظة القاهرة', month='2025-10')"""
+    unknown = set(filters) - set(cube['dimensions'])
+    if unknown:
+        raise KeyError(f"Unknown cube dimensions: {sorted(unknown)}")
+
+    rows = np.flatnonzero(_cell_mask(cube, (), filters))
+    if len(rows) == 0:
+        return {'gmv': 0.0, 'lines': 0, 'orders': 0, 'customers': 0}
+    row = rows[0]
+    return {measure: cube[measure][row].item() for measure in CUBE_MEASURES}
+
+
+def cube_slice(cube, by, **filters):
+    """DataFrame of the cells grouped by the `by` dimensions, other dimensions rolled up"""
+    by = (by,) if isinstance(by, str) else tuple(by)
+    unknown = (set(by) | set(filters)) - set(cube['dimensions'])
+    if unknown:
+        raise KeyError(f"Unknown cube dimensions: {sorted(unknown)}")
+
+    rows = np.flatnonzero(_cell_mask(cube, by, filters))
+    result = pd.DataFrame({
+        dim: cube['labels'][dim][cube['codes'][rows, cube['dimensions'].index(dim)]]
+        for dim in by
+    })
+    for measure in CUBE_MEASURES:
+        result[measure] = cube[measure][rows]
+    return result.sort_values('gmv', ascending=False).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else CUBE_FILE
+    cube = load_cube(path)
+    total = cube_lookup(cube)
+    print(f"Cube: {path} ({len(cube['gmv']):,} cells)")
+    for dim in cube['dimensions']:
+        print(f"  {dim}: {len(cube['labels'][dim]):,} values")
+    print(f"Total GMV: {total['gmv']:,.2f}")
+    print(f"Lines: {total['lines']:,}  Orders: {total['orders']:,}  Customers: {total['customers']:,}")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Column schemas for every tabular input
+Each input file maps to a schema of column kinds. load_table() parses the
+file with matching dtypes (categoricals for low-cardinality text), then
+canonicalizes phones, ids and quantities once, vectorized, so scripts no
+longer cast values row by row. Loads go through csv_cache, which stores the
+typed frame.
+
+Dates stay text (as categoricals, there are few distinct days): the enriched
+CSV and the dashboard keep the source's date format, and
+order_lines.parse_dates handles the mixed formats when a stage needs real
+dates.
+
+load_tables() loads several independent inputs concurrently on a thread
+pool (parsing and Parquet reads release the GIL) and reports each file's
+time and throughput.
+
+Usage: python schema.py [file ...]   show each file's dtypes and memory
+"""
+import fnmatch
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from csv_cache import load_csv
+
+# Bump when canonicalization changes so cached frames are rebuilt
+SCHEMA_VERSION = 2
+
+# Order-line files (data.csv, data_cleaned*.csv, overall.csv)
+LINE_SCHEMA = {
+    'name': 'text',
+    'phone': 'phone',
+    'city': 'category',
+    'area': 'category',
+    'Type': 'category',
+    'date': 'category',
+    'base_id': 'id',
+    'product': 'category',
+    'brand': 'category',
+    'category': 'category',
+    'amount': 'quantity',
+    'price_gross': 'money',
+    'distribution_route': 'category',
+}
+
+PROFILE_SCHEMA = {
+    'phone': 'phone',
+    'retailer_type': 'category',
+    'retailer_name': 'text',
+    'distribution_route': 'category',
+    'area': 'category',
+    'city': 'category',
+}
+
+PRODUCT_SCHEMA = {
+    'ID': 'id',
+    'Name': 'text',
+}
+
+# File name pattern -> schema
+SCHEMAS = {
+    'data.csv': LINE_SCHEMA,
+    'data_cleaned.csv': LINE_SCHEMA,
+    'data_cleaned_enriched.csv': LINE_SCHEMA,
+    'overall.csv': LINE_SCHEMA,
+    'retailers_profiles.csv': PROFILE_SCHEMA,
+    'base-products-*.csv': PRODUCT_SCHEMA,
+}
+
+# Kind -> dtype read_csv parses the column as (None: inferred, then canonicalized)
+READ_DTYPES = {
+    'text': 'str',
+    'category': 'category',
+    'phone': None,
+    'id': None,
+    'quantity': 'float64',
+    'money': 'float64',
+}
+
+
+def schema_for(path):
+    """Schema of the first pattern matching the file name, or None"""
+    name = os.path.basename(path)
+    for pattern, schema in SCHEMAS.items():
+        if fnmatch.fnmatch(name, pattern):
+            return schema
+    return None
+
+
+def _integral(values):
+    """Nullable Int64 copy of a numeric column, or None when it holds fractions"""
+    present = values.dropna()
+    if not np.all(np.mod(present, 1) == 0):
+        return None
+    return values.astype('Int64')
+
+
+def canonical_phones(values):
+    """Digits only, as nullable Int64 (what normalize_phone keeps, without the float '.0')"""
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = _integral(values)
+        if numbers is not None:
+            return numbers
+    text = values.astype('str').str.strip().str.replace(r'\.0$', '', regex=True)
+    digits = text.str.replace(r'\D', '', regex=True).where(values.notna() & (text != ''))
+    return pd.to_numeric(digits.where(digits != ''), errors='coerce').astype('Int64')
+
+
+def phone_keys(values):
+    """Digit-string lookup keys from a phone column, None where missing (no float '.0' round-trip)"""
+    keys = canonical_phones(values).astype('string')
+    return keys.astype(object).where(keys.notna(), None)
+
+
+def canonical_ids(values):
+    """Nullable Int64 when every present id is an integer, otherwise the stripped text"""
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = _integral(values)
+        return values if numbers is None else numbers
+    numbers = pd.to_numeric(values, errors='coerce')
+    present = values.notna()
+    if numbers[present].isna().any() or not np.all(np.mod(numbers[present], 1) == 0):
+        return values.str.strip()
+    return numbers.astype('Int64')
+
+
+def canonical_quantities(values):
+    """int32 when every quantity is whole and fits, else float64"""
+    if values.isna().any() or not np.all(np.mod(values, 1) == 0):
+        return values
+    if len(values) and values.abs().max() >= np.iinfo(np.int32).max:
+        return values
+    return values.astype('int32')
+
+
+def apply_schema(df, schema):
+    """Canonical phone, id and quantity columns for the columns of df the schema declares"""
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        if kind == 'phone':
+            df[column] = canonical_phones(df[column])
+        elif kind == 'id':
+            df[column] = canonical_ids(df[column])
+        elif kind == 'quantity':
+            df[column] = canonical_quantities(df[column])
+    return df
+
+
+def read_dtypes(schema, categories=True):
+    """read_csv dtype mapping for a schema (text instead of categoricals when categories is False)"""
+    dtypes = {column: READ_DTYPES[kind] for column, kind in schema.items() if READ_DTYPES[kind]}
+    if not categories:
+        dtypes = {column: ('str' if dtype == 'category' else dtype) for column, dtype in dtypes.items()}
+    return dtypes
+
+
+def load_table(path, categories=True, **options):
+    """
+    Typed DataFrame for an input file (same options as pd.read_csv)
+
+    Scripts that write new values into text columns pass categories=False,
+    since a categorical only accepts values it already knows. Files without
+    a schema load as read_csv would.
+    """
+    schema = schema_for(path)
+    if schema is None:
+        return load_csv(path, **options)
+
+    columns = pd.read_csv(path, nrows=0, **{k: v for k, v in options.items() if k in ('sep', 'encoding')}).columns
+    dtypes = {column: dtype for column, dtype in read_dtypes(schema, categories).items() if column in columns}
+    options['dtype'] = {**dtypes, **(options.get('dtype') or {})}
+
+    def canonicalize(df):
+        return apply_schema(df, schema)
+
+    return load_csv(path, prepare=canonicalize, prepare_key=(SCHEMA_VERSION, sorted(schema.items())), **options)
+
+
+def _timed_load(path, options):
+    started = time.perf_counter()
+    try:
+        result = load_table(path, **options)
+    except Exception as e:
+        result = e
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    return result, time.perf_counter() - started, size
+
+
+def load_tables(specs, workers=None):
+    """
+    Load {path: load_table options} concurrently
+
+    Returns {path: (DataFrame, or the exception the load raised, seconds, bytes)}
+    so each caller keeps its own handling of a missing or broken file.
+    """
+    with ThreadPoolExecutor(max_workers=workers or len(specs) or 1) as pool:
+        futures = {path: pool.submit(_timed_load, path, dict(options)) for path, options in specs.items()}
+        return {path: future.result() for path, future in futures.items()}
+
+
+def load_rate(seconds, size):
+    """'0.42s, 118.3 MB/s' for a load's duration and file size"""
+    return f"{seconds:.2f}s, {size / 1e6 / seconds if seconds > 0 else 0:,.1f} MB/s"
+
+
+if __name__ == '__main__':
+    sources = sys.argv[1:] or ['data_cleaned.csv', 'data_cleaned_enriched.csv', 'retailers_profiles.csv', 'overall.csv']
+    for source in sources:
+        if not os.path.exists(source):
+            print(f"⚠️ {source} not found, skipping")
+            continue
+        raw = pd.read_csv(source, sep='\t', low_memory=False, encoding='utf-8')
+        typed = load_table(source, sep='\t', low_memory=False, encoding='utf-8')
+        raw_mb = raw.memory_usage(deep=True).sum() / 1e6
+        typed_mb = typed.memory_usage(deep=True).sum() / 1e6
+        print(f"{source}: {raw_mb:,.1f} MB -> {typed_mb:,.1f} MB ({raw_mb / typed_mb:.1f}x)")
+        for column, dtype in typed.dtypes.items():
+            print(f"  {column}: {dtype}")
+    print("✅ Schemas checked")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Customer segmentation shared by generate_comprehensive_dashboard.py and fix_segmentation.py
+Segments and their conditions are declared in segmentation_rules.json and
+compiled once into vectorized predicates over metric arrays; a single
+np.select then assigns the first matching segment to every customer
+
+With "mode": "quantile" the cutoffs come from the conditions' "quantile"
+fields instead of their fixed values, read from mergeable t-digests of the
+customer metrics
+"""
+import copy
+import json
+import operator
+import os
+
+import numpy as np
+
+from sketches import TDigest
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'segmentation_rules.json')
+
+# Metrics a rule condition may reference
+METRICS = ('total_gmv', 'unique_orders', 'avg_order_value', 'unique_dates', 'frequency_score',
+           'recency_days', 'r_score', 'f_score', 'm_score', 'typical_gap_days', 'gap_ratio')
+
+# RFM fields (see rfm.py) and cadence fields (see churn.py); customers without
+# them get NaN, and compile_condition makes every comparison on NaN false
+# (including '!=')
+RFM_METRICS = ('recency_days', 'r_score', 'f_score', 'm_score')
+CHURN_METRICS = ('typical_gap_days', 'gap_ratio')
+
+# Metrics with quantile sketches for the adaptive mode
+QUANTILE_METRICS = ('total_gmv', 'unique_orders', 'avg_order_value')
+QUANTILES_FILE = 'segment_quantiles.json'
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+SEGMENT_FIELDS = ('key', 'name', 'name_en', 'color', 'reason')
+
+
+def customer_metrics(customers):
+    """Metric arrays used by the rules, built from customer dicts"""
+    n = len(customers)
+    gmv = np.fromiter((c['total_gmv'] for c in customers), dtype=np.float64, count=n)
+    orders = np.fromiter((c['unique_orders'] for c in customers), dtype=np.float64, count=n)
+    avg_value = np.fromiter((c.get('avg_order_value', 0) for c in customers), dtype=np.float64, count=n)
+    unique_dates = np.fromiter((c.get('unique_dates', 0) for c in customers), dtype=np.float64, count=n)
+
+    # Fall back to GMV / orders when the payload has no average
+    missing_avg = (avg_value == 0) & (orders > 0)
+    avg_value[missing_avg] = gmv[missing_avg] / orders[missing_avg]
+
+    metrics = {
+        'total_gmv': gmv,
+        'unique_orders': orders,
+        'avg_order_value': avg_value,
+        'unique_dates': unique_dates,
+        # Activity frequency: share of 30 purchase days, capped at 100
+        'frequency_score': np.minimum(unique_dates / 30, 1) * 100
+    }
+    for metric in RFM_METRICS + CHURN_METRICS:
+        metrics[metric] = np.fromiter(
+            (np.nan if c.get(metric) is None else c[metric] for c in customers),
+            dtype=np.float64, count=n
+        )
+    return metrics
+
+
+def compile_condition(condition):
+    """
+    Turn one condition into a function of the metric arrays
+
+    A condition is {"metric", "op", "value"} or {"any": [conditions]};
+    a list of conditions means all of them must hold.
+    """
+    if isinstance(condition, list):
+        parts = [compile_condition(c) for c in condition]
+        if not parts:
+            return lambda m: np.ones(len(next(iter(m.values()))), dtype=bool)
+        return lambda m: np.logical_and.reduce([part(m) for part in parts])
+
+    if 'any' in condition:
+        parts = [compile_condition(c) for c in condition['any']]
+        return lambda m: np.logical_or.reduce([part(m) for part in parts])
+
+    metric, op, value = condition['metric'], condition['op'], condition['value']
+    if metric not in METRICS:
+        raise ValueError(f"Unknown segmentation metric: {metric}")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown segmentation operator: {op}")
+    compare = OPERATORS[op]
+    return lambda m: compare(m[metric], value) & ~np.isnan(m[metric])
+
+
+def build_metric_sketches(metrics):
+    """
+    T-digests of the quantile metrics over the current customers
+
+    The metrics are cumulative per customer, so after new orders the sketches
+    are rebuilt from the refreshed customers: feeding a returning customer's
+    new totals into an old digest would count that customer twice.
+    """
+    return {metric: TDigest().update(metrics[metric]) for metric in QUANTILE_METRICS}
+
+
+def merge_metric_sketches(sketches, other):
+    """Merge sketches of a disjoint set of customers (another partition) into `sketches`"""
+    for metric, digest in other.items():
+        sketches.setdefault(metric, TDigest()).merge(digest)
+    return sketches
+
+
+def save_metric_sketches(sketches, path=QUANTILES_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({metric: digest.to_dict() for metric, digest in sketches.items()}, f)
+
+
+def load_metric_sketches(path=QUANTILES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {metric: TDigest.from_dict(data) for metric, data in json.load(f).items()}
+
+
+def _resolve_quantiles(condition, sketches):
+    """Replace the value of every condition carrying a quantile with the sketch's cutoff"""
+    if isinstance(condition, list):
+        for part in condition:
+            _resolve_quantiles(part, sketches)
+    elif 'any' in condition:
+        _resolve_quantiles(condition['any'], sketches)
+    elif 'quantile' in condition:
+        if condition['metric'] not in sketches:
+            raise ValueError(f"No quantile sketch for metric: {condition['metric']}")
+        condition['value'] = round(sketches[condition['metric']].quantile(condition['quantile']), 2)
+
+
+def adapt_rules(config, sketches):
+    """Copy of a rule-set config with its quantile conditions turned into fixed cutoffs"""
+    config = copy.deepcopy(config)
+    for seg in config['segments']:
+        _resolve_quantiles(seg['when'], sketches)
+    return config
+
+
+def compile_rules(config, sketches=None):
+    """
+    Compile a rule-set dict (see segmentation_rules.json) into segments and predicates
+
+    In quantile mode the cutoffs are resolved from `sketches`; without them the
+    rule set stays pending and classify_customers sketches the customers it gets.
+    """
+    quantile_mode = config.get('mode', 'fixed') == 'quantile'
+    if quantile_mode and sketches is None:
+        predicates = None
+    else:
+        if quantile_mode:
+            config = adapt_rules(config, sketches)
+        predicates = [compile_condition(seg['when']) for seg in config['segments']]
+
+    segments = [{field: seg.get(field, '') for field in SEGMENT_FIELDS} for seg in config['segments']]
+    default = {field: config['default'].get(field, '') for field in SEGMENT_FIELDS}
+    return {
+        'mode': config.get('mode', 'fixed'),
+        'config': config,
+        'segments': segments,
+        'default': default,
+        'predicates': predicates
+    }
+
+
+def load_rules(path=RULES_FILE, sketches=None):
+    """Load and compile a rule-set file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return compile_rules(json.load(f), sketches)
+
+
+RULES = load_rules()
+SEGMENTS = RULES['segments']
+DEFAULT_SEGMENT = RULES['default']
+
+
+def classify_metrics(metrics, rules=None):
+    """Index into the rule set's segments for every customer (len(segments) means the default)"""
+    rules = rules or RULES
+    conditions = [predicate(metrics) for predicate in rules['predicates']]
+    if not conditions:
+        return np.full(len(metrics['total_gmv']), 0)
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+
+
+def classify_customers(customers, rules=None, sketches=None):
+    """Segment dict (key, name, name_en, color, reason) for every customer dict"""
+    rules = rules or RULES
+    metrics = customer_metrics(customers)
+    if rules['predicates'] is None or (sketches is not None and rules['mode'] == 'quantile'):
+        rules = compile_rules(rules['config'], sketches or build_metric_sketches(metrics))
+    segments = rules['segments'] + [rules['default']]
+    return [segments[i] for i in classify_metrics(metrics, rules)]
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mergeable streaming sketches
+TDigest keeps a bounded set of weighted centroids that answers quantile
+queries; HyperLogLog estimates distinct counts in fixed memory. Sketches
+built on separate batches or partitions merge into one without revisiting
+the raw values
+"""
+import hashlib
+import math
+
+import numpy as np
+
+
+def merge_sorted(means, weights, other_means, other_weights):
+    """Merge two sorted (means, weights) runs in linear time, without re-sorting either"""
+    positions = np.searchsorted(means, other_means, side='right') + np.arange(len(other_means))
+    from_other = np.zeros(len(means) + len(other_means), dtype=bool)
+    from_other[positions] = True
+    merged_means = np.empty(len(from_other))
+    merged_weights = np.empty(len(from_other))
+    merged_means[positions], merged_weights[positions] = other_means, other_weights
+    merged_means[~from_other], merged_weights[~from_other] = means, weights
+    return merged_means, merged_weights
+
+
+class TDigest:
+    """Merging t-digest with vectorized batch updates"""
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values, weights=None):
+        """Add a batch of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return self
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        order = np.argsort(values, kind='mergesort')
+        self._compress(*merge_sorted(self.means, self.weights, values[order], weights[order]))
+        return self
+
+    def merge(self, other):
+        """Fold another digest into this one"""
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(*merge_sorted(self.means, self.weights, other.means, other.weights))
+        return self
+
+    def _compress(self, means, weights):
+        """Merge sorted points into centroids whose size follows the arcsine scale function"""
+        total = weights.sum()
+
+        # Quantile at each point's center, mapped to k in [0, compression];
+        # points falling in the same unit of k become one centroid, so the tails stay fine-grained
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+        starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Estimated value at quantile q (scalar or array in [0, 1])"""
+        if len(self.means) == 0:
+            return np.nan if np.isscalar(q) else np.full(np.shape(q), np.nan)
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        result = np.interp(np.asarray(q, dtype=np.float64) * total, positions, values)
+        return float(result) if np.isscalar(q) else result
+
+    def to_dict(self, decimals=4):
+        """JSON-friendly representation"""
+        return {
+            'compression': self.compression,
+            'min': None if not len(self.means) else round(float(self.min), decimals),
+            'max': None if not len(self.means) else round(float(self.max), decimals),
+            'means': np.round(self.means, decimals).tolist(),
+            'weights': self.weights.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data.get('compression', 200))
+        digest.means = np.asarray(data.get('means', []), dtype=np.float64)
+        digest.weights = np.asarray(data.get('weights', []), dtype=np.float64)
+        if len(digest.means):
+            digest.min = data['min']
+            digest.max = data['max']
+        return digest
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2**precision registers (standard error ~1.04 / sqrt(2**precision))
+
+    Small sets stay exact: value hashes are kept as a sorted uint64 array
+    until there are more than 2**precision / 8 of them (the registers' size
+    in bytes), then folded into the registers. Supports add() and len() like
+    a set, so it can stand in for one.
+    """
+
+    # Hashes add() collects before folding them into the sorted array
+    PENDING_LIMIT = 32
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 18: {precision}")
+        self.precision = precision
+        self.registers = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._pending = []
+
+    @staticmethod
+    def hash(value):
+        """Stable 64-bit hash of a value's string form"""
+        return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+    @property
+    def size(self):
+        return 1 << self.precision
+
+    @property
+    def sparse_limit(self):
+        return self.size // 8
+
+    def add(self, value):
+        h = self.hash(value)
+        if self.registers is None:
+            self._pending.append(h)
+            if len(self._pending) >= self.PENDING_LIMIT:
+                self._flush()
+        else:
+            rest = h & ((1 << (64 - self.precision)) - 1)
+            rank = 64 - self.precision - rest.bit_length() + 1
+            index = h >> (64 - self.precision)
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def update(self, values):
+        """Add a batch of values"""
+        hashes = np.fromiter((self.hash(v) for v in values), dtype=np.uint64)
+        if self.registers is None:
+            self._flush()
+            self._add_sparse(hashes)
+        else:
+            self._insert(hashes)
+        return self
+
+    def _flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._add_sparse(np.array(pending, dtype=np.uint64))
+
+    def _add_sparse(self, hashes):
+        self.hashes = np.union1d(self.hashes, hashes)
+        if len(self.hashes) > self.sparse_limit:
+            self._densify()
+
+    def _densify(self):
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+        self._insert(np.concatenate([self.hashes, np.array(self._pending, dtype=np.uint64)]))
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._pending = []
+
+    def _insert(self, hashes):
+        """Fold hashes into the registers: index from the top bits, rank = leading zeros of the rest + 1"""
+        if len(hashes) == 0:
+            return
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << tail_bits) - 1)
+
+        # Vectorized bit_length by binary search over shifts
+        bit_length = np.zeros(len(rest), dtype=np.int64)
+        for shift in (32, 16, 8, 4, 2, 1):
+            big = rest >= (np.uint64(1) << np.uint64(shift))
+            bit_length[big] += shift
+            rest[big] >>= np.uint64(shift)
+        bit_length += rest > 0
+
+        np.maximum.at(self.registers, index, (tail_bits - bit_length + 1).astype(np.uint8))
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog precision {other.precision} into {self.precision}")
+        other._flush()
+        if other.registers is None:
+            if self.registers is None:
+                self._flush()
+                self._add_sparse(other.hashes)
+            else:
+                self._insert(other.hashes)
+        else:
+            if self.registers is None:
+                self._densify()
+            np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """Estimated number of distinct values (exact while the sketch is sparse)"""
+        self._flush()
+        if self.registers is None:
+            return len(self.hashes)
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def to_dict(self):
+        """JSON-friendly representation"""
+        self._flush()
+        if self.registers is None:
+            return {'precision': self.precision, 'hashes': self.hashes.tolist()}
+        return {'precision': self.precision, 'registers': self.registers.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('precision', 12))
+        if data.get('registers') is not None:
+            sketch.registers = np.asarray(data['registers'], dtype=np.uint8)
+        else:
+            sketch.hashes = np.unique(np.array(data.get('hashes', []), dtype=np.uint64))
+        return sketch
@@ -0,0 +1,90 @@
+"""sync_history merges appended lines and rebuilds the state when an input changed"""
+import os
+
+import pandas as pd
+import pytest
+
+from customer_state import export_customers, open_state, sync_history
+
+COLUMNS = ['name', 'phone', 'area', 'city', 'Type', 'order_id', 'date', 'product', 'brand', 'amount', 'price_gross']
+LINES = [
+    ['Cafe Nile', 201000000001, 'Maadi', 'Cairo', 'cafe', 'o1', '2025-01-05', 'Tea', 'Lipton', 2, 10.0],
+    ['Cafe Nile', 201000000001, 'Maadi', 'Cairo', 'cafe', 'o1', '2025-01-05', 'Sugar', 'Dahab', 1, 5.0],
+    ['Hotel Giza', 201000000002, 'Dokki', 'Giza', 'hotel', 'o2', '2025-01-06', 'Tea', 'Lipton', 10, 10.0],
+]
+
+
+@pytest.fixture
+def files(tmp_path):
+    lines_file, profiles_file = tmp_path / 'data_cleaned.csv', tmp_path / 'retailers_profiles.csv'
+    _write(lines_file, LINES)
+    profiles_file.write_text('phone\tarea\n201000000001\tMaadi\n', encoding='utf-8')
+    return str(lines_file), str(profiles_file), str(tmp_path / 'customer_state.db')
+
+
+def _write(path, rows, mode='w'):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, sep='\t', index=False, mode=mode, header=(mode == 'w'))
+
+
+def _sync(lines_file, profiles_file, state_file, key='test'):
+    conn = open_state(state_file)
+    try:
+        merged, changed = sync_history(conn, pd.read_csv(lines_file, sep='\t'), lines_file, [profiles_file], key=key)
+        return merged, changed, {c['name']: c for c in export_customers(conn)}
+    finally:
+        conn.close()
+
+
+def test_first_run_builds_and_rerun_merges_nothing(files):
+    merged, changed, customers = _sync(*files)
+    assert merged == 3 and changed
+    assert customers['Cafe Nile']['total_gmv'] == 25.0
+
+    merged, changed, again = _sync(*files)
+    assert (merged, changed) == (0, [])
+    assert again == customers
+
+
+def test_appended_lines_merge_alone_and_match_a_rebuild(files):
+    lines_file, profiles_file, state_file = files
+    _sync(*files)
+    _write(lines_file, [['Cafe Nile', 201000000001, 'Zamalek', 'Cairo', 'cafe', 'o3', '2025-02-01', 'Tea', 'Lipton',
+                         1, 10.0]], mode='a')
+
+    merged, changed, customers = _sync(*files)
+    assert (merged, changed) == (1, [])
+    assert customers['Cafe Nile']['total_gmv'] == 35.0
+    assert customers['Cafe Nile']['unique_orders'] == 2
+    assert customers['Cafe Nile']['area'] == 'Zamalek'
+
+    rebuilt = _sync(lines_file, profiles_file, state_file + '.fresh')[2]
+    assert customers == rebuilt
+
+
+def test_rewritten_history_rebuilds(files):
+    lines_file = files[0]
+    _sync(*files)
+    corrected = [row[:] for row in LINES]
+    corrected[0][9] = 3   # same file size, different amount
+    _write(lines_file, corrected)
+    stat = os.stat(lines_file)
+    os.utime(lines_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    merged, changed, customers = _sync(*files)
+    assert merged == 3 and changed == [lines_file]
+    assert customers['Cafe Nile']['total_gmv'] == 35.0
+    assert customers['Hotel Giza']['total_gmv'] == 100.0
+
+
+def test_changed_input_or_key_rebuilds(files):
+    lines_file, profiles_file, _ = files
+    _sync(*files)
+    with open(profiles_file, 'a', encoding='utf-8') as f:
+        f.write('201000000002\tDokki\n')
+
+    merged, changed, customers = _sync(*files)
+    assert merged == 3 and changed == [profiles_file]
+    assert customers['Cafe Nile']['total_gmv'] == 25.0
+
+    merged, changed, _ = _sync(*files, key='other')
+    assert merged == 3 and set(changed) == {lines_file, profiles_file}
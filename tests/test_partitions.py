@@ -0,0 +1,73 @@
+"""Partition versions swap atomically and cleanup leaves other writers alone"""
+import os
+import time
+
+import pandas as pd
+
+from partitions import CURRENT_FILE, current_version, is_current, load_partitions, remove_stale, write_partitions
+
+
+def _lines(gmv=1.0):
+    return pd.DataFrame({
+        'month': ['2025-01', '2025-01', '2025-02'],
+        'city': ['Cairo', None, 'Giza'],
+        'order_date': pd.to_datetime(['2025-01-03', '2025-01-20', '2025-02-04']),
+        'amount': [1.0, 2.0, 3.0],
+        'gmv': [gmv, 2 * gmv, 3 * gmv],
+    })
+
+
+def _versions(root):
+    return sorted(name for name in os.listdir(root) if name != CURRENT_FILE)
+
+
+def test_write_swaps_current_and_keeps_previous(tmp_path):
+    root = str(tmp_path / 'store')
+    write_partitions(_lines(1.0), root)
+    first = os.path.basename(current_version(root))
+    write_partitions(_lines(10.0), root)
+    second = os.path.basename(current_version(root))
+
+    assert second != first
+    assert _versions(root) == sorted([first, second])
+    assert load_partitions(root)['gmv'].sum() == 60.0
+    assert load_partitions(root, start='2025-02-01', cities=['Giza'])['gmv'].tolist() == [30.0]
+
+    write_partitions(_lines(100.0), root)
+    assert first not in _versions(root) and second in _versions(root)
+
+
+def test_cleanup_spares_in_progress_and_newer_writes(tmp_path):
+    root = str(tmp_path / 'store')
+    write_partitions(_lines(), root)
+    in_progress = f'v{time.time_ns()}.tmp'
+    abandoned = 'v1.tmp'
+    newer = f'v{time.time_ns() + 10 ** 12}'
+    for name in (in_progress, abandoned, newer, 'month=2024-01'):
+        os.makedirs(os.path.join(root, name))
+    os.utime(os.path.join(root, abandoned), (0, 0))
+
+    write_partitions(_lines(), root)
+    names = _versions(root)
+    assert in_progress in names and newer in names
+    assert abandoned not in names and 'month=2024-01' not in names
+
+
+def test_remove_stale_honours_max_age(tmp_path):
+    root = tmp_path / 'store'
+    (root / 'v5.tmp').mkdir(parents=True)
+    remove_stale(str(root), keep=('v9',), max_age=3600)
+    assert (root / 'v5.tmp').exists()
+    remove_stale(str(root), keep=('v9',), max_age=-1)
+    assert not (root / 'v5.tmp').exists()
+
+
+def test_is_current_follows_the_source(tmp_path):
+    root, source = str(tmp_path / 'store'), tmp_path / 'data_cleaned.csv'
+    source.write_text('a\n1\n', encoding='utf-8')
+    write_partitions(_lines(), root, source=str(source), key='list')
+
+    assert is_current(root, str(source), 'list')
+    assert not is_current(root, str(source), 'net')
+    source.write_text('a\n1\n2\n', encoding='utf-8')
+    assert not is_current(root, str(source), 'list')
@@ -0,0 +1,71 @@
+"""The dashboard generator and fix_segmentation.py put every customer in the same segment"""
+import json
+
+import numpy as np
+import pytest
+
+from segmentation import RULES_FILE, build_metric_sketches, classify_customers, compile_rules, customer_metrics
+
+
+def _customers(count=500, seed=3):
+    rng = np.random.default_rng(seed)
+    customers = []
+    for i in range(count):
+        orders = int(rng.integers(1, 300))
+        gmv = round(float(rng.lognormal(11, 1.5)), 2)
+        customer = {
+            'name': f'customer {i}',
+            'total_gmv': gmv,
+            'unique_orders': orders,
+            'unique_dates': int(rng.integers(1, orders + 1)),
+            'avg_order_value': round(gmv / orders, 2),
+        }
+        # Customers without RFM or cadence fields, as for one-off buyers
+        if i % 7:
+            customer.update({'recency_days': int(rng.integers(0, 400)), 'r_score': int(rng.integers(1, 6)),
+                             'f_score': int(rng.integers(1, 6)), 'm_score': int(rng.integers(1, 6))})
+        if i % 5:
+            customer.update({'typical_gap_days': round(float(rng.uniform(1, 60)), 1),
+                             'gap_ratio': round(float(rng.uniform(0, 5)), 2)})
+        customers.append(customer)
+    return customers
+
+
+def _generator_segments(customers, rules):
+    """generate_comprehensive_dashboard.py: sketches of its customers, passed to classify_customers"""
+    sketches = build_metric_sketches(customer_metrics(customers))
+    return [seg['key'] for seg in classify_customers(customers, rules, sketches=sketches)]
+
+
+def _fixer_segments(customers, rules):
+    """fix_segmentation.py: customers read back from dashboard_data.json, cutoffs sketched in quantile mode"""
+    customers = json.loads(json.dumps(customers, ensure_ascii=False))
+    if rules['mode'] == 'quantile':
+        rules = compile_rules(rules['config'], build_metric_sketches(customer_metrics(customers)))
+    return [seg['key'] for seg in classify_customers(customers, rules)]
+
+
+@pytest.mark.parametrize('mode', ['fixed', 'quantile'])
+def test_generator_and_fixer_agree(mode):
+    with open(RULES_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['mode'] = mode
+    rules = compile_rules(config)
+    customers = _customers()
+
+    generated = _generator_segments(customers, rules)
+    assert generated == _fixer_segments(customers, rules)
+    assert len(set(generated)) > 1
+
+
+def test_quantile_mode_follows_the_population():
+    with open(RULES_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['mode'] = 'quantile'
+    rules = compile_rules(config)
+    customers = _customers()
+    scaled = [{**c, 'total_gmv': c['total_gmv'] * 1000, 'avg_order_value': c['avg_order_value'] * 1000}
+              for c in customers]
+
+    # Cutoffs are quantiles, so scaling every customer's value keeps the segments
+    assert _fixer_segments(scaled, rules) == _fixer_segments(customers, rules)
@@ -0,0 +1,73 @@
+"""Merging HyperLogLog and TDigest sketches gives the sketch of the combined data"""
+import numpy as np
+import pytest
+
+from sketches import HyperLogLog, TDigest
+
+
+def _hll(values, precision=10):
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_sparse_merge_is_exact():
+    left, right = _hll(range(0, 60)), _hll(range(40, 100))
+    merged = left.merge(right)
+    assert merged.registers is None
+    assert merged.count() == 100
+
+
+@pytest.mark.parametrize('left_values, right_values', [
+    (range(0, 5_000), range(2_500, 7_500)),     # dense + dense
+    (range(0, 5_000), range(4_990, 5_050)),     # dense + sparse
+    (range(4_990, 5_050), range(0, 5_000)),     # sparse + dense
+    (range(0, 100), range(100, 200)),           # sparse + sparse past the sparse limit
+])
+def test_merge_matches_sketch_of_union(left_values, right_values):
+    merged = _hll(left_values).merge(_hll(right_values))
+    union = _hll(list(left_values) + list(right_values))
+    assert merged.count() == union.count()
+    if union.registers is not None:
+        assert np.array_equal(merged.registers, union.registers)
+
+
+def test_merge_after_round_trip():
+    left = HyperLogLog.from_dict(_hll(range(0, 3_000)).to_dict())
+    right = HyperLogLog.from_dict(_hll(range(1_000, 4_000)).to_dict())
+    estimate = left.merge(right).count()
+    assert abs(estimate - 4_000) < 4_000 * 0.1
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
+
+
+def test_digest_merge_matches_single_digest():
+    rng = np.random.default_rng(7)
+    left, right = rng.lognormal(5, 1, 20_000), rng.lognormal(6, 0.5, 30_000)
+    merged = TDigest().update(left).merge(TDigest().update(right))
+    combined = np.concatenate([left, right])
+
+    assert merged.count == len(combined)
+    assert merged.min == combined.min() and merged.max == combined.max()
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(combined, q), rel=0.02)
+
+
+def test_digest_merge_after_round_trip():
+    values = np.arange(1, 10_001, dtype=np.float64)
+    parts = [TDigest.from_dict(TDigest().update(chunk).to_dict()) for chunk in np.array_split(values, 4)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.count == len(values)
+    assert merged.quantile(0.5) == pytest.approx(5_000, rel=0.01)
+
+
+def test_merge_with_empty_digest():
+    digest = TDigest().update([1.0, 2.0, 3.0])
+    assert digest.merge(TDigest()).quantile(0.5) == pytest.approx(2.0)
+    assert TDigest().merge(digest).quantile(0.5) == pytest.approx(2.0)
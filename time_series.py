@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Time-bucketed GMV and order-count series per customer, area, city and segment
+Series are stored sparse (CSR style): one shared period axis per frequency and,
+per group, only the periods with activity. This keeps them small enough to
+embed in the dashboard payload.
+"""
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+# Series level -> order-line column
+SERIES_LEVELS = {
+    'customer': 'name',
+    'area': 'area',
+    'city': 'city',
+    'segment': 'segment',
+}
+
+
+def period_codes(dates, frequency):
+    """Integer period index for each date (days, Monday-based weeks or months since epoch)"""
+    days = dates.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    if frequency == 'daily':
+        return days.astype(np.int64)
+    if frequency == 'weekly':
+        # 1970-01-01 was a Thursday, shift by 3 so weeks start on Monday
+        return (days.astype(np.int64) + 3) // 7
+    if frequency == 'monthly':
+        return days.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+
+def period_label(codes, frequency):
+    """Readable labels for period codes ('2025-10-27' for days and week starts, '2025-10' for months)"""
+    codes = np.asarray(codes, dtype=np.int64)
+    if frequency == 'daily':
+        return np.datetime_as_string(codes.astype('datetime64[D]'), unit='D').tolist()
+    if frequency == 'weekly':
+        return np.datetime_as_string((codes * 7 - 3).astype('datetime64[D]'), unit='D').tolist()
+    if frequency == 'monthly':
+        return np.datetime_as_string(codes.astype('datetime64[M]'), unit='M').tolist()
+    raise ValueError(f"Unknown frequency: {frequency}")
+
+
+def build_series(lines, key, frequency):
+    """GMV and distinct-order series of one frequency for every value of `key`"""
+    dated = lines[lines['order_date'].notna()]
+    periods = period_codes(dated['order_date'], frequency)
+    group_codes, keys = pd.factorize(dated[key].astype(str), sort=True)
+    period_axis, period_index = np.unique(periods, return_inverse=True)
+
+    frame = pd.DataFrame({
+        'group': group_codes,
+        'period': period_index.reshape(-1),
+        'gmv': dated['gmv'].to_numpy(dtype=np.float64),
+        'order': pd.factorize(dated['order_id'].astype(str))[0]
+    })
+    cells = frame.groupby(['group', 'period'], sort=True).agg(
+        gmv=('gmv', 'sum'),
+        orders=('order', 'nunique')
+    ).reset_index()
+
+    counts = np.bincount(cells['group'].to_numpy(), minlength=len(keys))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    return {
+        'periods': period_label(period_axis, frequency),
+        'keys': [str(k) for k in keys],
+        'offsets': offsets.tolist(),
+        'period_index': cells['period'].tolist(),
+        'gmv': np.round(cells['gmv'].to_numpy(), 2).tolist(),
+        'orders': cells['orders'].tolist()
+    }
+
+
+def build_all_series(lines, levels=SERIES_LEVELS, frequencies=FREQUENCIES):
+    """{frequency: {level: series}} for the levels whose column exists in `lines`"""
+    result = {}
+    for frequency in frequencies:
+        result[frequency] = {}
+        for level, column in levels.items():
+            if column in lines.columns:
+                result[frequency][level] = build_series(lines, column, frequency)
+    return result
+
+
+def dense_series(series, key):
+    """Expand one group's sparse series to dense (gmv, orders) arrays over the period axis"""
+    position = series['keys'].index(key)
+    start, end = series['offsets'][position], series['offsets'][position + 1]
+    gmv = np.zeros(len(series['periods']))
+    orders = np.zeros(len(series['periods']), dtype=np.int64)
+    index = series['period_index'][start:end]
+    gmv[index] = series['gmv'][start:end]
+    orders[index] = series['orders'][start:end]
+    return gmv, orders
+
+
+if __name__ == '__main__':
+    from order_lines import prepare_order_lines
+    from schema import load_table
+
+    source = sys.argv[1] if len(sys.argv) > 1 else 'data_cleaned.csv'
+    output = sys.argv[2] if len(sys.argv) > 2 else 'time_series.json'
+
+    print(f"Loading {source}...")
+    lines = prepare_order_lines(load_table(source, sep='\t', encoding='utf-8'))
+    series = build_all_series(lines)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(series, f, ensure_ascii=False)
+
+    for frequency, levels in series.items():
+        for level, data in levels.items():
+            print(f"  {frequency:>7} / {level:<8}: {len(data['keys']):,} series, "
+                  f"{len(data['periods']):,} periods, {len(data['gmv']):,} points")
+    print(f"✅ Time series saved to {output}")
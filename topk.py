@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grouped top-K selection for the dashboard hierarchy (area, city, ...)
+Keeps a bounded min-heap per group instead of sorting every group in full,
+and accumulates the group totals in the same pass
+"""
+import heapq
+from collections import defaultdict
+from itertools import count
+
+
+def grouped_top_k(items, group_key, value_key, k, k_overrides=None):
+    """
+    Select the top `k` items by `value_key` for every `group_key` value
+
+    `k_overrides` maps a group name to its own K (e.g. a larger K for big cities).
+    Returns {group: {'items', 'top_total', 'total', 'count'}} where `items` is
+    sorted by value descending. Ties keep the input order, matching a stable sort.
+    """
+    k_overrides = k_overrides or {}
+    heaps = defaultdict(list)
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    sequence = count()
+
+    for item in items:
+        group = item[group_key]
+        value = item[value_key]
+        totals[group] += value
+        counts[group] += 1
+
+        limit = k_overrides.get(group, k)
+        if limit <= 0:
+            continue
+
+        # Later items get a smaller tie-breaker so they are evicted first on equal values
+        entry = (value, -next(sequence), item)
+        heap = heaps[group]
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    groups = {}
+    for group in totals:
+        top_items = [entry[2] for entry in sorted(heaps.get(group, []), reverse=True)]
+        groups[group] = {
+            'items': top_items,
+            'top_total': sum(item[value_key] for item in top_items),
+            'total': totals[group],
+            'count': counts[group]
+        }
+    return groups
+
+
+def rank_groups(groups, key='top_total', limit=None):
+    """Return (group, info) pairs ordered by `key` descending"""
+    ranked = sorted(groups.items(), key=lambda x: x[1][key], reverse=True)
+    return ranked[:limit] if limit is not None else ranked
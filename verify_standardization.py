@@ -1,19 +1,35 @@
-import pandas as pd
+import os
 
-df = pd.read_csv('data_cleaned.csv', sep='\t')
+from order_lines import fill_missing
+from rollup_cube import CUBE_FILE, cube_is_current, cube_slice, load_cube
+from schema import load_table
 
 print("=" * 70)
 print("STANDARDIZATION VERIFICATION")
 print("=" * 70)
 
+# Cities and types come from the rollup cube when generate_comprehensive_dashboard.py
+# has built it from the current data_cleaned.csv; a stale or unstamped cube falls back to the scan
+cube = load_cube(CUBE_FILE) if os.path.exists(CUBE_FILE) else None
+if cube is not None and not cube_is_current(cube, 'data_cleaned.csv'):
+    print(f"⚠️ {CUBE_FILE} is older than data_cleaned.csv, scanning the CSV instead")
+    cube = None
+
+if cube is not None:
+    city_counts = cube_slice(cube, 'city').set_index('city')['lines'].to_dict()
+    types_data = cube_slice(cube, 'Type').set_index('Type')['lines'].to_dict()
+    df = load_table('data_cleaned.csv', sep='\t', usecols=['name'])
+else:
+    df = load_table('data_cleaned.csv', sep='\t')
+    # Missing values counted as UNKNOWN, as the cube (built from prepared order lines) does
+    city_counts = fill_missing(df['city']).value_counts().loc[lambda counts: counts > 0].to_dict()
+    types_data = fill_missing(df['Type']).value_counts().loc[lambda counts: counts > 0].to_dict()
+
 print("\n📍 CITIES (محافظة):")
-cities = sorted(df['city'].unique())
-for city in cities:
-    count = len(df[df['city'] == city])
-    print(f"  • {city}: {count} سجل")
+for city in sorted(city_counts):
+    print(f"  • {city}: {city_counts[city]} سجل")
 
 print("\n\n📝 TYPES (الأنواع):")
-types_data = df['Type'].value_counts().to_dict()
 for type_name, count in sorted(types_data.items(), key=lambda x: x[1], reverse=True)[:20]:
     print(f"  • {type_name}: {count} سجل")
 
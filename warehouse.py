@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local SQLite warehouse for order lines and retailer profiles
+Loads the order lines (the enriched CSV when present, else data_cleaned.csv),
+overall.csv and retailers_profiles.csv into one indexed SQLite file, so
+ad-hoc lookups (a phone, a customer, an order, a product, a date range)
+are index seeks instead of full CSV scans. Sources are reloaded only when
+their size or mtime changed; rows go in with batched executemany inside one
+transaction, and indexes are built after the load.
+
+Views:
+  enriched_lines  order lines with the retailer profile of their phone
+  customers       one row per customer_id ("name_phone") with totals and dates
+
+Usage: python warehouse.py [--rebuild] [phone ...]
+Refreshes warehouse.db and prints what it holds for each phone
+"""
+import os
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+from order_lines import parse_dates
+from orders import customer_ids
+from schema import load_table
+
+WAREHOUSE_FILE = 'warehouse.db'
+
+# Rows per executemany call
+BATCH_SIZE = 50_000
+
+LINE_COLUMNS = ['customer_id', 'name', 'phone', 'area', 'city', 'type', 'order_id', 'date', 'order_date',
+                'base_id', 'product', 'brand', 'category', 'amount', 'price_gross', 'gmv', 'distribution_route']
+PROFILE_COLUMNS = ['phone', 'retailer_type', 'retailer_name', 'distribution_route', 'area', 'city']
+
+LINE_TABLE = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    customer_id TEXT,
+    name TEXT,
+    phone INTEGER,
+    area TEXT,
+    city TEXT,
+    type TEXT,
+    order_id TEXT,
+    date TEXT,
+    order_date TEXT,
+    base_id INTEGER,
+    product TEXT,
+    brand TEXT,
+    category TEXT,
+    amount REAL,
+    price_gross REAL,
+    gmv REAL,
+    distribution_route TEXT
+);
+'''
+
+SCHEMA = LINE_TABLE.format(table='order_lines') + LINE_TABLE.format(table='overall_lines') + '''
+CREATE TABLE IF NOT EXISTS retailer_profiles (
+    phone INTEGER,
+    retailer_type TEXT,
+    retailer_name TEXT,
+    distribution_route TEXT,
+    area TEXT,
+    city TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    table_name TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE VIEW IF NOT EXISTS enriched_lines AS
+SELECT l.*,
+       (SELECT p.retailer_name FROM retailer_profiles p WHERE p.phone = l.phone ORDER BY p.rowid LIMIT 1)
+           AS retailer_name,
+       (SELECT p.retailer_type FROM retailer_profiles p WHERE p.phone = l.phone ORDER BY p.rowid LIMIT 1)
+           AS retailer_type,
+       COALESCE(l.distribution_route,
+                (SELECT p.distribution_route FROM retailer_profiles p WHERE p.phone = l.phone
+                 ORDER BY p.rowid LIMIT 1)) AS route
+FROM order_lines l;
+CREATE VIEW IF NOT EXISTS customers AS
+SELECT customer_id,
+       MIN(name) AS name,
+       MIN(phone) AS phone,
+       MIN(area) AS area,
+       MIN(city) AS city,
+       MIN(type) AS type,
+       COUNT(*) AS line_count,
+       COUNT(DISTINCT order_id) AS order_count,
+       SUM(amount) AS item_count,
+       ROUND(SUM(gmv), 2) AS total_gmv,
+       MIN(order_date) AS first_date,
+       MAX(order_date) AS last_date
+FROM order_lines
+GROUP BY customer_id;
+'''
+
+LINE_INDEXES = ['phone', 'customer_id', 'base_id', 'order_id', 'order_date', 'city, order_date']
+
+# Table -> (indexed columns, source files in order of preference)
+TABLES = {
+    'order_lines': (LINE_INDEXES, ['data_cleaned_enriched.csv', 'data_cleaned.csv']),
+    'overall_lines': (LINE_INDEXES, ['overall.csv']),
+    'retailer_profiles': (['phone'], ['retailers_profiles.csv']),
+}
+
+
+def open_warehouse(path=WAREHOUSE_FILE, reset=False):
+    """Open (and create if needed) the warehouse; reset=True starts from empty"""
+    if reset and os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def index_name(table, columns):
+    return f"idx_{table}_{columns.replace(', ', '_')}"
+
+
+def line_frame(df):
+    """Order lines in the warehouse column layout (ISO order_date, gmv, customer_id)"""
+    lines = pd.DataFrame(index=df.index)
+    for column in LINE_COLUMNS:
+        source = 'Type' if column == 'type' else column
+        if source in df.columns:
+            lines[column] = df[source]
+    lines['customer_id'] = customer_ids(df)
+    if 'order_id' in lines.columns:
+        lines['order_id'] = lines['order_id'].astype('str').where(lines['order_id'].notna())
+    amount = pd.to_numeric(df['amount'], errors='coerce')
+    price = pd.to_numeric(df['price_gross'], errors='coerce')
+    lines['gmv'] = (amount * price).round(2)
+    lines['order_date'] = parse_dates(df['date']).dt.strftime('%Y-%m-%d')
+    return lines.reindex(columns=LINE_COLUMNS)
+
+
+def profile_frame(df):
+    return df.reindex(columns=PROFILE_COLUMNS)
+
+
+def insert_frame(conn, table, frame):
+    """Batched inserts of a frame whose columns match the table; returns rows inserted"""
+    placeholders = ', '.join('?' * len(frame.columns))
+    statement = f"INSERT INTO {table} ({', '.join(frame.columns)}) VALUES ({placeholders})"
+    for start in range(0, len(frame), BATCH_SIZE):
+        batch = frame.iloc[start:start + BATCH_SIZE].astype(object)
+        batch = batch.where(batch.notna(), None)
+        conn.executemany(statement, batch.itertuples(index=False, name=None))
+    return len(frame)
+
+
+def load_source(conn, table, path, stat):
+    """Replace a table's rows with a source file's, rebuilding its indexes after the load"""
+    indexes, _ = TABLES[table]
+    df = load_table(path, sep='\t', low_memory=False, encoding='utf-8')
+    frame = profile_frame(df) if table == 'retailer_profiles' else line_frame(df)
+
+    with conn:
+        for columns in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name(table, columns)}")
+        conn.execute(f"DELETE FROM {table}")
+        rows = insert_frame(conn, table, frame)
+        for columns in indexes:
+            conn.execute(f"CREATE INDEX {index_name(table, columns)} ON {table} ({columns})")
+        conn.execute('INSERT OR REPLACE INTO sources (table_name, source, size, mtime, rows) VALUES (?, ?, ?, ?, ?)',
+                     (table, os.path.abspath(path), stat.st_size, stat.st_mtime_ns, rows))
+    conn.execute('ANALYZE')
+    return rows
+
+
+def refresh_warehouse(conn, tables=None):
+    """
+    Load every table whose source changed since the last refresh
+
+    Returns {table: rows loaded, 0 when unchanged, None when no source file exists}.
+    """
+    loaded = {}
+    for table in tables or TABLES:
+        _, candidates = TABLES[table]
+        path = next((candidate for candidate in candidates if os.path.exists(candidate)), None)
+        if path is None:
+            loaded[table] = None
+            continue
+        stat = os.stat(path)
+        seen = conn.execute('SELECT 1 FROM sources WHERE table_name = ? AND source = ? AND size = ? AND mtime = ?',
+                            (table, os.path.abspath(path), stat.st_size, stat.st_mtime_ns)).fetchone()
+        loaded[table] = 0 if seen else load_source(conn, table, path, stat)
+    return loaded
+
+
+def query(conn, sql, params=()):
+    """DataFrame of a query's rows"""
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def phone_lookup(conn, phone):
+    """{'profiles', 'overall', 'customers'} DataFrames for one phone number"""
+    phone = int(phone)
+    # A literal id list lets SQLite push the filter into the grouped view (an IN subquery would not)
+    ids = [row[0] for row in conn.execute('SELECT DISTINCT customer_id FROM order_lines WHERE phone = ?', (phone,))]
+    return {
+        'profiles': query(conn, 'SELECT * FROM retailer_profiles WHERE phone = ?', (phone,)),
+        'overall': query(conn, 'SELECT * FROM overall_lines WHERE phone = ?', (phone,)),
+        'customers': query(conn, f"SELECT * FROM customers WHERE customer_id IN ({', '.join('?' * len(ids))})",
+                           ids),
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    rebuild = '--rebuild' in args
+    phones = [arg for arg in args if arg != '--rebuild']
+
+    conn = open_warehouse(WAREHOUSE_FILE, reset=rebuild)
+    started = time.perf_counter()
+    for table, rows in refresh_warehouse(conn).items():
+        if rows is None:
+            print(f"   ⚠️ {table}: no source file found")
+        elif rows:
+            print(f"   [OK] Loaded {table}: {rows:,} rows")
+        else:
+            print(f"   [SKIP] {table} up to date")
+    print(f"✅ Warehouse saved to {WAREHOUSE_FILE} ({time.perf_counter() - started:.2f}s)")
+
+    for phone in phones:
+        started = time.perf_counter()
+        found = phone_lookup(conn, phone)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"\n📞 {phone} ({elapsed:.1f} ms)")
+        print(f"   Profiles: {len(found['profiles'])}, overall lines: {len(found['overall'])}")
+        for customer in found['customers'].itertuples(index=False):
+            print(f"   {customer.customer_id}: {customer.order_count} orders, {customer.total_gmv:,.2f} EGP "
+                  f"({customer.first_date} → {customer.last_date})")
+    conn.close()